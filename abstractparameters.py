@@ -1,26 +1,323 @@
+import codecs
 import datetime
+import itertools
+import multiprocessing
+import re
+import threading
+import time
+import traceback
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# global revision counter used for dirty tracking
+revisionCounter = itertools.count(1)
+
+def nextRevision():
+    return next(revisionCounter)
+
+class BatchState(threading.local):
+    # per thread: nesting depth and parameters with pending callbacks/refreshes (dicts keep insertion order)
+    def __init__(self):
+        self.depth = 0
+        self.callbacks = dict()
+        self.refreshes = dict()
+        self.quiet = 0 # > 0 while observers run for a change made with execute_callbacks=False
+
+batchState = BatchState()
+
+class ParameterBatch:
+    # Context manager that defers parameter callbacks and view refreshes until the outermost batch ends.
+    # Each affected parameter then runs its callback and refresh once, with its final value.
+    # Callbacks triggered while flushing are coalesced the same way.
+    def __enter__(self):
+        batchState.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        batchState.depth -= 1
+        if batchState.depth == 0:
+            flushParameterBatch()
+        return False
+
+def flushParameterBatch():
+    batchState.depth += 1
+    try:
+        while len(batchState.callbacks) > 0 or len(batchState.refreshes) > 0:
+            callbacks = batchState.callbacks
+            batchState.callbacks = dict()
+            for p in callbacks:
+                if p.callback != None:
+                    p.callback(p)
+            if len(batchState.callbacks) > 0:
+                continue # refresh after cascading callbacks have settled
+            refreshes = batchState.refreshes
+            batchState.refreshes = dict()
+            if isMainThread():
+                refreshViews(refreshes)
+            else:
+                dispatchResult(lambda: refreshViews(refreshes))
+    finally:
+        batchState.depth -= 1
+        batchState.callbacks.clear()
+        batchState.refreshes.clear()
+
+def refreshViews(parameters):
+    for p in parameters:
+        viewRefresh = p.viewRefresh
+        if viewRefresh != None:
+            viewRefresh(p)
+
+def isMainThread():
+    # views (widgets) live in the main thread; refreshes from other threads go through dispatchResult
+    return threading.current_thread() is threading.main_thread()
+
+def batchUpdate():
+    # batch spanning any number of items: with batchUpdate(): ...
+    return ParameterBatch()
+
+# Results of AsyncCallbacks are handed to the result dispatcher, a function taking a function to run.
+# Without GUI they run right away in the worker thread; gui_elements installs one that runs them in the Qt thread.
+resultDispatcher = None
+callbackExecutor = None
+
+def setResultDispatcher(dispatcher):
+    global resultDispatcher
+    resultDispatcher = dispatcher
+
+def dispatchResult(function):
+    if resultDispatcher is None:
+        function()
+    else:
+        resultDispatcher(function)
+
+def getCallbackExecutor():
+    # shared thread pool for AsyncCallbacks without their own executor
+    global callbackExecutor
+    if callbackExecutor is None:
+        callbackExecutor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="guifw-callback")
+    return callbackExecutor
+
+def applyParameterUpdates(parameter, result):
+    # default AsyncCallback result handler: a dict of parameter name -> value updates the parameter's item
+    if isinstance(result, dict) and isinstance(parameter.parent, ItemWithParameters):
+        with ParameterBatch():
+            for name, value in result.items():
+                p = parameter.parent.getParameter(name)
+                if p is not None:
+                    p.updateValue(value)
+
+class ParameterUpdateQueue:
+    # Background threads post values here instead of calling updateValue; the GUI thread drains the
+    # queue in one batch per frame. Only the latest value per parameter is kept, so fast producers
+    # never pile up work for the UI, and the lock is only held for a dict assignment or swap.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.updates = dict()
+        self.onPending = None # called (from the posting thread) when the queue becomes non-empty
+
+    def __len__(self):
+        return len(self.updates)
+
+    def post(self, parameter, value):
+        with self.lock:
+            wasEmpty = len(self.updates) == 0
+            self.updates[parameter] = value
+        if wasEmpty and self.onPending is not None:
+            self.onPending()
+
+    def drain(self):
+        # apply all pending values, returns the number of updated parameters
+        with self.lock:
+            if len(self.updates) == 0:
+                return 0
+            updates = self.updates
+            self.updates = dict()
+        with ParameterBatch():
+            for p, value in updates.items():
+                try:
+                    p.updateValue(value)
+                except Exception:
+                    traceback.print_exc()
+        return len(updates)
+
+parameterUpdates = ParameterUpdateQueue()
+
+class AsyncCallback:
+    # Parameter callback that runs function(value) on an executor (thread or process pool) instead of
+    # blocking the caller. Only the latest run per parameter counts: a pending older run is cancelled
+    # and results of superseded runs are dropped. onResult(parameter, result) runs through the result
+    # dispatcher (in the GUI thread when gui_elements is loaded).
+    # With passParameter=True the function gets the parameter instead of its value (thread pools only).
+    def __init__(self, function, onResult=applyParameterUpdates, executor=None, passParameter=False):
+        self.function = function
+        self.onResult = onResult
+        self.executor = executor
+        self.passParameter = passParameter
+        self.generations = dict()
+        self.futures = dict()
+        self.lock = threading.Lock()
+
+    def __call__(self, parameter):
+        executor = self.executor if self.executor is not None else getCallbackExecutor()
+        argument = parameter if self.passParameter else parameter.getValue()
+        with self.lock:
+            generation = self.generations.get(parameter, 0) + 1
+            self.generations[parameter] = generation
+            previous = self.futures.pop(parameter, None)
+            if previous is not None:
+                previous.cancel()
+            future = executor.submit(self.function, argument)
+            self.futures[parameter] = future
+        future.add_done_callback(lambda f: self.finished(parameter, generation, f))
+
+    def isCurrent(self, parameter, generation):
+        return self.generations.get(parameter) == generation
+
+    def finished(self, parameter, generation, future):
+        if future.cancelled() or not self.isCurrent(parameter, generation):
+            return
+        with self.lock:
+            if self.futures.get(parameter) is future:
+                del self.futures[parameter]
+        error = future.exception()
+        if error is not None:
+            dispatchResult(lambda: traceback.print_exception(type(error), error, error.__traceback__))
+        elif self.onResult is not None:
+            result = future.result()
+            # a newer run may have been started while the result was on its way
+            dispatchResult(lambda: self.isCurrent(parameter, generation) and self.onResult(parameter, result))
+
+    def isBusy(self, parameter=None):
+        with self.lock:
+            if parameter is None:
+                return len(self.futures) > 0
+            return parameter in self.futures
 
 class ItemWithParameters:
     def __init__(self, name="-", name_generator = None,  parameters=[]):
+        self.revision=0 # latest revision of any of the item's parameters, see EditableParameter.markDirty
         self.name=TextParameter(parent=self, name="Name", value=name)
         self.selected=False
+        self.savedRevision=0
+        self.savedName=name
         self.parameters=parameters
 
+    # assigning a new parameter structure drops the name index
+    @property
+    def parameters(self):
+        return self._parameters
+
+    @parameters.setter
+    def parameters(self, parameters):
+        self._parameters = parameters
+        self.invalidateParameterIndex()
+        self.adoptParameters()
+
+    def invalidateParameterIndex(self):
+        # call after modifying nested parameter lists in place
+        self.parameterIndex = None
+        self.parameterIndexSize = 0
+        self.exportCache = None
+
+    def adoptParameters(self):
+        # parameters created without a parent get this item, so their changes update the item's revision
+        revision = getattr(self, "revision", 0)
+        for p in iterRecursiveList(self._parameters):
+            if p.parent is None:
+                p.parent = self
+            if p.revision > revision:
+                revision = p.revision
+        self.revision = revision
+
+    def getParameterIndex(self):
+        # name -> parameter for all (nested) parameters, built on first use.
+        # Appending to or removing from the top level list is picked up automatically.
+        if self.parameterIndex is None or self.parameterIndexSize != len(self._parameters):
+            self.parameterIndex = dict([(p.name, p) for p in iterRecursiveList(self._parameters)])
+            self.parameterIndexSize = len(self._parameters)
+            self.adoptParameters()
+            self.exportCache = None
+        return self.parameterIndex
+
+    def getParameter(self, name):
+        return self.getParameterIndex().get(name)
+
     def getName(self):
         return self.name
 
-    # store all parameters to a dict
+    def batchUpdate(self):
+        # with item.batchUpdate(): ... coalesces callbacks and view refreshes of all changed parameters
+        return ParameterBatch()
+
+    def runCallbacksAsync(self, executor=None, onResult=applyParameterUpdates):
+        # Opt in to running the callbacks of all parameters on an executor (see AsyncCallback). The
+        # callbacks get the parameter and must not touch widgets themselves; view refreshes of parameters
+        # they update are passed to the GUI thread. Returning {name: value} updates parameters of this
+        # item in the GUI thread.
+        for p in iterRecursiveList(self.parameters):
+            if p.callback is not None and not isinstance(p.callback, AsyncCallback) and not isinstance(p, ActionParameter):
+                p.callback = AsyncCallback(p.callback, onResult=onResult, executor=executor, passParameter=True)
+
+    # Store all parameters to a dict. The export is reused while the item's revision is unchanged, unless a
+    # parameter has a value string that changes on its own (see hasLiveValueString); don't modify the result.
     def toDict(self):
-        return {"type": self.__class__.__name__, "name": self.name.getValue(), "parameters":exportRecursiveList(self.parameters)}
+        if self.exportCache is not None and self.exportCache[0] == (self.getRevision(), len(self._parameters)):
+            return self.exportCache[1]
+        output = {"type": self.__class__.__name__, "name": self.name.getValue(), "parameters":exportRecursiveList(self.parameters)}
+        if any([p.hasLiveValueString() for p in iterRecursiveList(self._parameters)]):
+            self.exportCache = None
+        else:
+            self.exportCache = ((self.getRevision(), len(self._parameters)), output)
+        return output
 
-    def restoreParametersFromDict(self, paramList):
-        print(paramList)
-        flattenedDict = dict([(p.name, p) for p in flattenRecursiveList(self.parameters)])
-        print(self.parameters)
-        for p in flattenRecursiveList(paramList):
-            if p["name"] in flattenedDict.keys():
-                print("updating " + p["name"])
-                flattenedDict[p["name"]].updateValueByString(value = p["value"], execute_callbacks = False)
+    def restoreParametersFromDict(self, paramList, execute_callbacks = False):
+        parameterIndex = self.getParameterIndex()
+        for p in iterRecursiveList(paramList):
+            if p["name"] in parameterIndex:
+                parameterIndex[p["name"]].updateValueByString(value = p["value"], execute_callbacks = execute_callbacks)
+
+    ## dirty tracking: every value change stamps the parameter and its item with a new global revision number.
+    ## Values assigned to p.value directly (not through updateValue & co.) are not tracked.
+    def getRevision(self):
+        return max(self.revision, self.name.revision)
+
+    def checkpoint(self):
+        # mark the current state as saved. Returns the revision to pass to exportDelta later.
+        self.savedRevision = nextRevision()
+        self.savedName = self.name.getValue()
+        return self.savedRevision
+
+    def isDirty(self, sinceRevision=None):
+        if sinceRevision is None:
+            sinceRevision = self.savedRevision
+        return self.getRevision() > sinceRevision
+
+    def getDirtyParameters(self, sinceRevision=None):
+        if sinceRevision is None:
+            sinceRevision = self.savedRevision
+        return [p for p in iterRecursiveList(self.parameters) if p.revision > sinceRevision]
+
+    def exportDelta(self, sinceRevision=None):
+        # parameters changed since the given revision (default: last checkpoint), in toDict format
+        if sinceRevision is None:
+            sinceRevision = self.savedRevision
+        delta = {"type": self.__class__.__name__, "name": self.name.getValue(), "revision": nextRevision(),
+                 "parameters": [p.toDict() for p in self.getDirtyParameters(sinceRevision)]}
+        if self.name.revision > sinceRevision:
+            delta["previousName"] = self.savedName
+        return delta
+
+    def applyDelta(self, delta, execute_callbacks = False):
+        if delta["name"] != self.name.getValue():
+            self.name.updateValue(delta["name"], execute_callbacks)
+        self.restoreParametersFromDict(delta["parameters"], execute_callbacks)
+
+    def copyParametersFrom(self, other, execute_callbacks=False):
+        # copy values of all parameters with matching names from another item
+        parameterIndex = self.getParameterIndex()
+        for name, p in other.getParameterIndex().items():
+            if name in parameterIndex:
+                parameterIndex[name].updateValueByString(p.getValueString(), execute_callbacks)
 
     def serialize(self):
         output='<Item class="%s" name="%s">\n'%(self.__class__.__name__, self.name.getValue())
@@ -29,15 +326,25 @@ class ItemWithParameters:
         return output
 
     def deserialize(self, setstring):
-        checkedString=findBlock(setstring, description='Item class="%s" name="%s"'%(self.__class__.__name__, self.name.getValue()))
-        if checkedString is not None:
-
-            for p in self.parameters:
-                p.deserialize(checkedString)
+        # setstring can be a serialized string or an already parsed block tree
+        if isinstance(setstring, str):
+            setstring = parseBlocks(setstring)
+        itemBlock = setstring.findItem(self.__class__.__name__, self.name.getValue())
+        if itemBlock is not None:
+            self.restoreParametersFromBlock(itemBlock)
         else:
             print("invalid setstring")
 
+    def restoreParametersFromBlock(self, itemBlock, execute_callbacks=True):
+        parameterValues = itemBlock.getParameterIndex()
+        for name, p in self.getParameterIndex().items():
+            if name in parameterValues:
+                p.updateValueByString(parameterValues[name], execute_callbacks)
+
 class EditableParameter:
+    # parameters are created in large numbers, so the hierarchy uses __slots__ instead of a __dict__ per instance.
+    # __weakref__ is needed for connecting Qt signals to bound methods of parameters.
+    __slots__ = ("name", "parent", "value", "selected", "editable", "callback", "_viewRefresh", "active", "revision", "observers", "__weakref__")
 
     def __init__(self,  parent=None,  name="",  editable=True,   callback=None,  viewRefresh=None,  active=True):
         self.name=name
@@ -48,33 +355,98 @@ class EditableParameter:
         self.callback=callback
         self.viewRefresh = viewRefresh
         self.active=active
+        self.revision=0
+        self.observers=None
+
+    # A bound method as viewRefresh (usually widget.updateFromParameter) is only referenced weakly, so a
+    # parameter never keeps its widget alive and widgets are freed by reference counting when closed.
+    @property
+    def viewRefresh(self):
+        viewRefresh = self._viewRefresh
+        if viewRefresh.__class__ is weakref.WeakMethod:
+            return viewRefresh()
+        return viewRefresh
+
+    @viewRefresh.setter
+    def viewRefresh(self, viewRefresh):
+        if hasattr(viewRefresh, "__self__") and hasattr(viewRefresh, "__func__"):
+            viewRefresh = weakref.WeakMethod(viewRefresh)
+        self._viewRefresh = viewRefresh
 
     def updateValueOnly(self,  value):
         self.value=value
+        self.markDirty()
 
     def updateValue(self,  value, execute_callbacks=True):
         self.value=value
-        if execute_callbacks and self.callback!=None:
-            self.callback(self)
-        if execute_callbacks and self.viewRefresh!=None:
-            self.viewRefresh(self)
+        self.notifyChange(execute_callbacks)
 
     def commitValue(self):
+        self.notifyChange()
+
+    def markDirty(self):
+        self.revision = nextRevision()
+        if isinstance(self.parent, ItemWithParameters):
+            self.parent.revision = self.revision
+        if self.observers is not None:
+            for observer in self.observers:
+                observer(self)
+
+    # observers are called with the parameter on every value change, whether or not callbacks are executed
+    def addObserver(self, observer):
+        if self.observers is None:
+            self.observers = []
+        self.observers.append(observer)
+
+    def removeObserver(self, observer):
+        if self.observers is not None and observer in self.observers:
+            self.observers.remove(observer)
+            if len(self.observers) == 0:
+                self.observers = None
+
+    def notifyChange(self, execute_callbacks=True):
+        if execute_callbacks:
+            self.markDirty()
+            self.runCallback()
+            self.runViewRefresh()
+        else:
+            # observers (e.g. computed dependents) don't run callbacks either, see ComputedParameter.invalidate
+            batchState.quiet += 1
+            try:
+                self.markDirty()
+            finally:
+                batchState.quiet -= 1
+
+    # inside a ParameterBatch both are deferred and run at most once per parameter when the batch ends
+    def runCallback(self):
         if self.callback != None:
-            self.callback(self)
-
-        if self.viewRefresh!=None:
-            self.viewRefresh(self)
+            if batchState.depth > 0:
+                batchState.callbacks[self] = None
+            else:
+                self.callback(self)
+
+    def runViewRefresh(self):
+        viewRefresh = self.viewRefresh
+        if viewRefresh != None:
+            if batchState.depth > 0:
+                batchState.refreshes[self] = None
+            elif isMainThread():
+                viewRefresh(self)
+            else:
+                dispatchResult(lambda: refreshViews([self]))
 
     def updateValueByString(self,  value, execute_callbacks=True):
         self.updateValue(value, execute_callbacks)
 
+    def postValue(self, value):
+        # thread-safe updateValue: applied later in the GUI thread (see ParameterUpdateQueue)
+        parameterUpdates.post(self, value)
+
     def setActive(self,  active):
         if self.active == active:
             return
         self.active=active
-        if self.viewRefresh!=None:
-            self.viewRefresh(self)
+        self.runViewRefresh()
 
     def getValue(self):
         return self.value
@@ -82,19 +454,35 @@ class EditableParameter:
     def getValueString(self):
         return str(self.getValue())
 
+    # True if getValueString() can change without a revision bump (ItemWithParameters.toDict doesn't cache then)
+    def hasLiveValueString(self):
+        return False
+
     def toDict(self):
         return {"type": self.__class__.__name__, "name":self.name, "value":self.getValueString()}
 
+    # typed value for binary export (None, bool, int, float, str, datetime or lists of these).
+    # The default round-trips through the value string like toDict.
+    def getNativeValue(self):
+        return self.getValueString()
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        self.updateValueByString(value, execute_callbacks)
+
     def serialize(self):
         return '<param name="%s">%s</>'%(self.name, str(self.getValue()))
 
     def deserialize(self, setstring):
-        valueString = findBrackets(setstring, startBracket='<param name="%s">'%self.name, endBracket="</>")
-        print("updating ", self.name, "with", valueString)
-        self.updateValueByString(valueString)
+        if isinstance(setstring, str):
+            setstring = parseBlocks(setstring)
+        valueString = setstring.findParameter(self.name)
+        if valueString is not None:
+            self.updateValueByString(valueString)
 
 
 class TextParameter(EditableParameter):
+    __slots__ = ("formatString",)
+
     def __init__(self,  value="", formatString="{:s}",     **kwargs):
         self.formatString=formatString
         EditableParameter.__init__(self,  **kwargs)
@@ -102,6 +490,8 @@ class TextParameter(EditableParameter):
 
 
 class FileParameter(EditableParameter):
+    __slots__ = ("type", "fileSelectionPattern")
+
     def __init__(self,  value="",  fileSelectionPattern="All files (*.*)", type = "open",    **kwargs):
         EditableParameter.__init__(self,  **kwargs)
         self.type = type
@@ -109,6 +499,8 @@ class FileParameter(EditableParameter):
         self.fileSelectionPattern=fileSelectionPattern
 
 class DateParameter(EditableParameter):
+    __slots__ = ("formatString",)
+
     def __init__(self,  value="", formatString="%d/%m/%Y %H:%M:%S",     **kwargs):
         EditableParameter.__init__(self, **kwargs)
         self.value = value
@@ -120,15 +512,54 @@ class DateParameter(EditableParameter):
     def updateValue(self, value,  execute_callbacks = True):
         self.value = value
         self.value.strftime(self.formatString)
-        if execute_callbacks and self.callback != None:
-            self.callback(self)
-        if execute_callbacks and self.viewRefresh != None:
-            self.viewRefresh(self)
+        self.notifyChange(execute_callbacks)
+
+    def getNativeValue(self):
+        if isinstance(self.value, datetime.datetime):
+            return self.value
+        return None
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        if value is not None:
+            self.updateValue(value, execute_callbacks)
+
+class RatePolicy:
+    # How often interactive edits (slider drags, spinbox steps) run a parameter's callback. The value
+    # itself always follows the widget; only the callback is held back:
+    #   immediate: on every change
+    #   debounce:  once the value has not changed for interval seconds
+    #   throttle:  at most once per interval seconds, the last value is always delivered
+    #   release:   when the slider is released (other changes run immediately)
+    IMMEDIATE = "immediate"
+    DEBOUNCE = "debounce"
+    THROTTLE = "throttle"
+    RELEASE = "release"
+
+    def __init__(self, mode=IMMEDIATE, interval=0.0):
+        if mode not in (RatePolicy.IMMEDIATE, RatePolicy.DEBOUNCE, RatePolicy.THROTTLE, RatePolicy.RELEASE):
+            raise ValueError("unknown rate policy: %s" % mode)
+        self.mode = mode
+        self.interval = interval
+
+    @staticmethod
+    def debounce(seconds=0.2):
+        return RatePolicy(RatePolicy.DEBOUNCE, seconds)
+
+    @staticmethod
+    def throttle(hz=10.0):
+        return RatePolicy(RatePolicy.THROTTLE, 1.0 / hz)
+
+    @staticmethod
+    def onRelease():
+        return RatePolicy(RatePolicy.RELEASE)
 
 class NumericalParameter(EditableParameter):
-    def __init__(self,  value=0,  min=None,  max=None,  step=0,  enforceRange=False,  enforceStep=False,  slider=False, **kwargs):
+    __slots__ = ("min", "max", "slider", "step", "enforceRange", "enforceStep", "ratePolicy")
+
+    def __init__(self,  value=0,  min=None,  max=None,  step=0,  enforceRange=False,  enforceStep=False,  slider=False, ratePolicy=None, **kwargs):
         EditableParameter.__init__(self,  **kwargs)
         self.value=value
+        self.ratePolicy = ratePolicy
         self.min=min
         self.max=max
         self.slider = slider
@@ -143,47 +574,192 @@ class NumericalParameter(EditableParameter):
     def updateValueByString(self,  value, execute_callbacks = True):
         self.updateValue(float(value), execute_callbacks)
 
-    def updateValueQT(self,  value):
-        #print "new value",  value
-        self.value=value
+    def constrainValue(self, value):
+        # apply range clamping and step quantisation (see parametertable.constrainValues for arrays);
+        # a min or max of None leaves that side unbounded
         if self.enforceRange:
-            self.value=min(self.max,  max(self.min,  self.value))
+            if self.min is not None:
+                value=max(self.min,  value)
+            if self.max is not None:
+                value=min(self.max,  value)
         if self.enforceStep:
-            self.value=float(int(self.value/self.step)*self.step)
-        if self.callback!=None:
-            self.callback(self)
+            value=float(int(value/self.step)*self.step)
+        return value
+
+    def updateValueQT(self,  value):
+        #print "new value",  value
+        self.value=self.constrainValue(value)
+        self.markDirty()
+        self.runCallback()
 
     def updateValue(self,  value, execute_callbacks = True):
         #print "new value",  value
-        self.value=value
-        if self.enforceRange:
-            self.value=min(self.max,  max(self.min,  self.value))
-        if self.enforceStep:
-            self.value=float(int(self.value/self.step)*self.step)
-        if execute_callbacks and self.callback!=None:
-            self.callback(self)
-        if execute_callbacks and self.viewRefresh!=None:
-            self.viewRefresh(self)
+        self.value=self.constrainValue(value)
+        self.notifyChange(execute_callbacks)
+
+    def getNativeValue(self):
+        return self.value
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        self.updateValue(value, execute_callbacks)
+
+# ProgressParameters with posted state waiting for delivery (or a shared channel), drained by deliverProgress()
+progressParameters = dict()
+progressLock = threading.Lock()
+progressPendingHandler = None # called (from the posting thread) when a parameter is registered
+
+def setProgressPendingHandler(handler):
+    global progressPendingHandler
+    progressPendingHandler = handler
+
+def deliverProgress():
+    # Apply the latest posted state of every ProgressParameter. Called once per frame from the GUI
+    # thread (gui_elements.FrameUpdater); updates posted in between are coalesced.
+    with progressLock:
+        parameters = list(progressParameters.values())
+    for p in parameters:
+        p.deliver()
+
+def hasPendingProgress():
+    return len(progressParameters) > 0
+
+def postSharedProgress(channel, value, min=None, max=None):
+    # worker process side of ProgressParameter.getSharedChannel(); NaN keeps the current min/max
+    channel[1] = float("nan") if min is None else min
+    channel[2] = float("nan") if max is None else max
+    channel[0] = value
+    channel[3] += 1
 
 class ProgressParameter(EditableParameter):
+    __slots__ = ("min", "max", "step", "pending", "delivered", "shared", "sharedSequence", "runSequence",
+                 "startTime", "startValue", "lastTime", "lastValue", "rate")
+
     def __init__(self,  value=0,  min=None,  max=None,  step=0,  **kwargs):
         EditableParameter.__init__(self,  **kwargs)
         self.value=value
         self.min=min
         self.max=max
         self.step=step
-
-    def updateValue(self,  value,  min,  max):
-        #print "new value",  value
+        self.pending = None
+        self.delivered = None
+        self.shared = None
+        self.sharedSequence = 0
+        self.runSequence = 0 # channel sequence when the current run started
+        self.resetRate()
+
+    def updateValue(self,  value,  min=None,  max=None, execute_callbacks=True):
+        # from other threads this only posts the value; it is applied in the GUI thread
+        if threading.current_thread() is not threading.main_thread():
+            self.post(value, min, max)
+            return
+        if min is not None:
+            self.min=min
+        if max is not None:
+            self.max=max
+        self.measureRate(value)
         self.value=value
-        self.min=min
-        self.max=max
+        self.notifyChange(execute_callbacks)
+
+    def post(self, value, min=None, max=None):
+        # Safe from any thread and cheap enough for inner loops: only the latest state is kept, and a
+        # single reference assignment replaces it, so no lock is needed.
+        self.pending = (value, min, max)
+        if self.delivered is None:
+            self.register()
+
+    def register(self):
+        if self.delivered is None:
+            self.delivered = ()
+            with progressLock:
+                progressParameters[id(self)] = self
+            if progressPendingHandler is not None:
+                progressPendingHandler()
+
+    def unregister(self):
+        with progressLock:
+            progressParameters.pop(id(self), None)
+        self.delivered = None
+
+    def getSharedChannel(self):
+        # Shared memory [value, min, max, sequence] for worker processes, see postSharedProgress().
+        # The channel is polled until the current run has reported max, so call this again for every new run.
+        if self.shared is None:
+            self.shared = multiprocessing.RawArray("d", 4)
+        self.runSequence = self.shared[3]
+        self.register()
+        return self.shared
+
+    def deliver(self):
+        if self.shared is not None and self.shared[3] != self.sharedSequence:
+            self.sharedSequence = self.shared[3]
+            value, min, max = self.shared[0], self.shared[1], self.shared[2]
+            self.updateValue(value, None if min != min else min, None if max != max else max)
+        pending = self.pending
+        if pending is not None and pending is not self.delivered:
+            self.delivered = pending
+            self.updateValue(*pending)
+        elif self.shared is None or self.sharedRunFinished():
+            # the last posted state has been delivered: stop polling until the next post
+            self.unregister()
+            if self.pending is not pending: # posted in the meantime
+                self.register()
+
+    def sharedRunFinished(self):
+        # something was delivered since getSharedChannel() and it reached max
+        return (self.sharedSequence > self.runSequence and self.max is not None and self.value is not None
+                and self.value >= self.max)
+
+    def resetRate(self):
+        self.startTime = None
+        self.startValue = None
+        self.lastTime = None
+        self.lastValue = None
+        self.rate = None
+
+    def measureRate(self, value):
+        # exponentially smoothed throughput in value units per second
+        now = time.monotonic()
+        if self.lastValue is None or value is None or value < self.lastValue:
+            self.resetRate()
+            self.startTime, self.startValue = now, value
+        elif now > self.lastTime:
+            rate = (value - self.lastValue) / (now - self.lastTime)
+            self.rate = rate if self.rate is None else 0.8 * self.rate + 0.2 * rate
+        self.lastTime, self.lastValue = now, value
+
+    def getThroughput(self):
+        return self.rate
+
+    def getElapsed(self):
+        if self.startTime is None:
+            return 0.0
+        return time.monotonic() - self.startTime
+
+    def getEta(self):
+        # estimated seconds until max is reached, None if unknown
+        if self.rate is None or self.rate <= 0 or self.max is None or self.value is None:
+            return None
+        return max(0.0, (self.max - self.value) / self.rate)
+
+    def getStatusText(self):
+        eta = self.getEta()
+        if eta is None:
+            return "%p%"
+        return "%%p%%  %.1f/s  ETA %s" % (self.rate, datetime.timedelta(seconds=int(eta)))
 
     def updateValueByString(self,  value, execute_callbacks = True):
-        self.updateValue(float(value))
+        self.updateValue(float(value), execute_callbacks=execute_callbacks)
+
+    def getNativeValue(self):
+        return self.value
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        self.updateValue(value, execute_callbacks=execute_callbacks)
 
 
 class CheckboxParameter(EditableParameter):
+    __slots__ = ()
+
     def __init__(self,  value=False, **kwargs):
         EditableParameter.__init__(self,  **kwargs)
         self.value=value
@@ -197,51 +773,116 @@ class CheckboxParameter(EditableParameter):
             else:
                 self.value = True
 
-        if execute_callbacks and self.callback != None:
-            self.callback(self)
-        if execute_callbacks and self.viewRefresh != None:
-            self.viewRefresh(self)
+        self.notifyChange(execute_callbacks)
+
+    def getNativeValue(self):
+        return bool(self.value)
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        self.updateValue(value, execute_callbacks)
 
 class Choice:
+    __slots__ = ("name", "value")
+
     def __init__(self, name="", value=None):
         self.name=name
         self. value=value
 
+def choiceLabel(c):
+    # display string of a choice: item name, Choice name, string or str()
+    if hasattr(c, "name") and hasattr(c.name, "value"):
+        return c.name.value
+    elif hasattr(c, "name") and hasattr(c, "value"):
+        return str(c.name)
+    elif isinstance(c, str):
+        return c
+    else:
+        return str(c)
+
+def choiceValue(c):
+    if hasattr(c, "name") and hasattr(c, "value"):
+        return c.value
+    else:
+        return c
+
 class ChoiceParameter(EditableParameter):
+    __slots__ = ("_choices", "choiceList", "choiceStrings", "liveLabels", "stringIndex", "valueIndex")
+
     def __init__(self,  value=None, choices=None, **kwargs):
         EditableParameter.__init__(self, **kwargs)
         self.value = value
         self.choices = choices
 
-    def getChoiceStrings(self):
-        cs = []
-
+    # assigning choices rebuilds the lookup tables
+    @property
+    def choices(self):
+        return self._choices
 
-        if isinstance(self.choices, dict):
-            return [str(name) for name in self.choices.keys()]
+    @choices.setter
+    def choices(self, choices):
+        self._choices = choices
+        self.buildChoiceIndex()
 
+    def buildChoiceIndex(self):
+        # labels and value/label -> index maps, computed once per choices assignment
+        if self._choices is None:
+            self.choiceList = []
+        else:
+            self.choiceList = list(self._choices)
 
-        for c in self.choices:
-            if "name" in dir(c) and "value" in dir(c.name):
-                cs.append(c.name.value)
-            elif "name" in dir(c) and "value" in dir(c):
-                cs.append(c.name)
-            elif c.__class__.__name__ == "str":
-                cs.append(c)
+        # item names can change after assignment, so their labels are not cached
+        self.liveLabels = False
+        if isinstance(self._choices, dict):
+            self.choiceStrings = [str(name) for name in self.choiceList]
+        else:
+            self.choiceStrings = []
+            for c in self.choiceList:
+                if hasattr(c, "name") and hasattr(c.name, "value"):
+                    self.liveLabels = True
+                self.choiceStrings.append(choiceLabel(c))
+
+        # last match wins for labels, first match for values (as the old linear searches did)
+        self.stringIndex = dict([(s, i) for i, s in enumerate(self.choiceStrings)])
+        self.valueIndex = dict()
+        try:
+            for i, c in enumerate(self.choiceList):
+                self.valueIndex.setdefault(choiceValue(c), i)
+        except TypeError: # unhashable values, fall back to linear search
+            self.valueIndex = None
+
+    def checkChoiceIndex(self):
+        # catch choices lists that were appended to or shortened in place
+        if self._choices is not None and len(self._choices) != len(self.choiceList):
+            self.buildChoiceIndex()
+
+    def setChoices(self, choices, execute_callbacks=True):
+        # replace all choices at once, keeping the current selection if its value is still available
+        # (otherwise the selection is cleared)
+        oldValue = self.value
+        self.choices = choices
+        if oldValue is not None:
+            if isinstance(choices, dict):
+                index = self.getIndexByValue(oldValue)
             else:
-                cs.append(str(c))
-        return cs
+                index = self.getIndexByValue(choiceValue(oldValue))
+            self.value = self.choiceList[index] if index >= 0 else None
+            if self.value is None:
+                self.markDirty()
+        if execute_callbacks:
+            self.runViewRefresh()
+
+    def getChoiceStrings(self):
+        self.checkChoiceIndex()
+        if self.liveLabels:
+            return [choiceLabel(c) for c in self.choiceList]
+        return list(self.choiceStrings)
 
     def getValueString(self):
-        c = self.value
-        if "name" in dir(c) and "value" in dir(c.name):
-            return c.name.value
-        elif "name" in dir(c) and "value" in dir(c):
-            return str(c.name)
-        elif c.__class__.__name__ == "str":
-            return c
-        else:
-            return str(c)
+        return choiceLabel(self.value)
+
+    def hasLiveValueString(self):
+        # the selected item can be renamed
+        return hasattr(self.value, "name") and hasattr(self.value.name, "value")
 
     def getValue(self):
         if self.value is None:
@@ -250,103 +891,182 @@ class ChoiceParameter(EditableParameter):
         if isinstance(self.choices, dict):
             return self.choices[self.value]
 
-
-        c = self.value
-        if "name" in dir(c) and "value" in dir(c):
-            return c.value
-        else:
-            return c
-
+        return choiceValue(self.value)
 
     def getIndexByValue(self, value):
-        for i in range(0, len(self.choices)):
-            c = self.choices[i]
-            if "name" in dir(c) and "value" in dir(c):
-                if c.value == value:
-                    return i
-            else:
-                if c == value:
-                    return i
+        self.checkChoiceIndex()
+        if self.valueIndex is not None:
+            try:
+                return self.valueIndex.get(value, -1)
+            except TypeError:
+                pass
+        for i in range(0, len(self.choiceList)):
+            if choiceValue(self.choiceList[i]) == value:
+                return i
         return -1
 
+    def getIndexByString(self, value):
+        self.checkChoiceIndex()
+        index = self.stringIndex.get(value, -1)
+        if self.liveLabels and (index < 0 or choiceLabel(self.choiceList[index]) != value):
+            self.buildChoiceIndex()
+            index = self.stringIndex.get(value, -1)
+        return index
+
+    def getIndex(self):
+        # index of the current selection, or -1
+        if self.value is None:
+            return -1
+        if isinstance(self.choices, dict):
+            return self.getIndexByValue(self.value)
+        return self.getIndexByValue(choiceValue(self.value))
+
     def updateValue(self,  value, execute_callbacks = True):
-        #print(self.name, value)
-        for c in self.choices:
-            if "name" in dir(c) and "value" in dir(c):
-                if c.value == value:
-                    self.value = c
-                    break
-            else:
-                if c == value:
-                    self.value = c
-                    #print("set ", self.name, "to", self.value)
-                    break
-        if execute_callbacks and self.callback != None:
-            self.callback(self)
-        if execute_callbacks and self.viewRefresh != None:
-            self.viewRefresh(self)
+        index = self.getIndexByValue(value)
+        if index >= 0:
+            self.value = self.choiceList[index]
+        self.notifyChange(execute_callbacks)
 
     def updateValueByString(self,  value, execute_callbacks = True):
-        if isinstance(self.choices, dict):
+        index = self.getIndexByString(value)
+        if index >= 0:
+            self.value = self.choiceList[index]
+        elif isinstance(self.choices, dict):
             self.value = value
-        else:
-        #print "update value by string:", value
-            strings = self.getChoiceStrings()
-        for i in range(0, len(self.choices)):
-            s = strings[i]
-            if s == value:
-                print(i,  s)
-                self.value = self.choices[i]
-        if execute_callbacks and self.callback != None:
-            self.callback(self)
-
-        if execute_callbacks and self.viewRefresh != None:
-            self.viewRefresh(self)
-        #print(self.value)
+        self.notifyChange(execute_callbacks)
 
     def updateValueByIndex(self, index, execute_callbacks = True):
-        if isinstance(self.choices, dict):
-            self.value = [v for v in self.choices.keys()][index]
-        else:
-            self.value = self.choices[index]
+        self.checkChoiceIndex()
+        if index < 0 or index >= len(self.choiceList): # e.g. -1 from a cleared combo box
+            return
+        self.value = self.choiceList[index]
 
-        if execute_callbacks and self.callback != None:
-            self.callback(self)
+        self.notifyChange(execute_callbacks)
 
-        if execute_callbacks and self.viewRefresh != None:
-            self.viewRefresh(self)
-        #print(self.value)
+    def getNativeValue(self):
+        # index plus label, so files stay loadable if the available choices change
+        return [self.getIndex(), self.getValueString()]
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        index, label = value
+        self.checkChoiceIndex()
+        if index < 0 or index >= len(self.choiceList) or self.choiceStrings[index] != label:
+            self.updateValueByString(label, execute_callbacks)
+        else:
+            self.updateValueByIndex(index, execute_callbacks)
 
 
 class ActionParameter(EditableParameter):
+    __slots__ = ()
+
     def __init__(self,   **kwargs):
         EditableParameter.__init__(self, **kwargs)
 
-    def updateValueByString(self,  value):
+    def updateValueByString(self,  value, execute_callbacks=True):
+        pass
+
+    def getNativeValue(self):
+        return None
+
+    def updateValueByNative(self, value, execute_callbacks=True):
         pass
 
 class ImageViewer(EditableParameter):
+    __slots__ = ("height",)
+
     def __init__(self, image = None, height = 100, **kwargs):
         EditableParameter.__init__(self, **kwargs)
         self.height = height
         self.value =  image
 
+    # only image file names are stored, not image data
+    def getNativeValue(self):
+        if isinstance(self.value, str):
+            return self.value
+        return None
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        if value is not None:
+            self.updateValue(value, execute_callbacks)
+
+
+class ComputedParameter(EditableParameter):
+    # Read-only parameter derived from other parameters: value = function(*[input values]).
+    # The result is memoized. A change of any input (or of a computed input) only marks it invalid and
+    # refreshes its widget, so the function runs when the value is actually read or displayed.
+    __slots__ = ("function", "inputs", "valid", "formatString")
+
+    def __init__(self, function=None, inputs=[], formatString="{}", editable=False, **kwargs):
+        EditableParameter.__init__(self, editable=editable, **kwargs)
+        self.function = function
+        self.formatString = formatString
+        self.valid = False
+        self.inputs = list(inputs)
+        for p in self.inputs:
+            p.addObserver(self.inputChanged)
+
+    def inputChanged(self, input):
+        if self.valid:
+            self.invalidate()
+
+    def invalidate(self):
+        self.valid = False
+        self.value = None
+        # dependents are invalidated via markDirty, widgets pull the new value. Restores with
+        # execute_callbacks=False (and anything else changing inputs quietly) only invalidate.
+        self.notifyChange(batchState.quiet == 0)
+
+    def getValue(self):
+        if not self.valid:
+            self.value = self.function(*[p.getValue() for p in self.inputs])
+            self.valid = True
+        return self.value
+
+    def detach(self):
+        # stop following the inputs
+        for p in self.inputs:
+            p.removeObserver(self.inputChanged)
+        self.inputs = []
+
+    def updateValue(self, value, execute_callbacks=True):
+        pass
+
+    def updateValueByString(self, value, execute_callbacks=True):
+        pass
+
+    def getNativeValue(self):
+        return None
+
+    def updateValueByNative(self, value, execute_callbacks=True):
+        pass
+
+
+def matchBrackets(aString, startBracket="<", endBracket=">", open=1):
+    # returns the index of the end bracket that closes an already opened bracket, or -1.
+    # Jumps between bracket occurrences with str.find instead of testing every position.
+    nextStart = aString.find(startBracket)
+    nextEnd = aString.find(endBracket)
+    while nextEnd >= 0:
+        if nextStart >= 0 and nextStart < nextEnd:
+            open = open + 1
+            nextStart = aString.find(startBracket, nextStart + 1)
+        else:
+            open = open - 1
+            if open == 0:
+                return nextEnd
+            if nextStart == nextEnd:
+                nextStart = aString.find(startBracket, nextEnd + 1)
+            nextEnd = aString.find(endBracket, nextEnd + 1)
+    return -1
 
 def findBrackets( aString, startBracket="<", endBracket=">" ):
     if startBracket in aString:
         match = aString.split(startBracket,1)[1]
-        print (match)
-        open = 1
-        for index in range(0, len(match)):
-            if match[index:index + len(endBracket)] == endBracket:
-                open = open - 1
-            elif match[index:index+len(startBracket)] == startBracket:
-                open = open + 1
-
-            if open==0:
-                #return found string and rest string
-                return match[:index], match[index+len(endBracket):]
-        print("bracket match:", open)
+        index = matchBrackets(match, startBracket, endBracket)
+        if index >= 0:
+            #return found string and rest string
+            return match[:index], match[index+len(endBracket):]
+        print("bracket match failed")
     else:
         print("no brackets found")
     return "", ""
@@ -354,18 +1074,11 @@ def findBrackets( aString, startBracket="<", endBracket=">" ):
 
 def findBlock( aString, description="" ):
     signature = "<"+description+">"
-    startBracket="<"
-    endBracket="</>"
     if signature in aString:
         match = aString.split(signature,1)[1]
-        open = 1
-        for index in range(0, len(match)):
-            if match[index:index + len(endBracket)] == endBracket:
-                open = open - 1
-            elif match[index:index+len(startBracket)] == startBracket:
-                open = open + 1
-            if open==0:
-                return match[:index]
+        index = matchBrackets(match, startBracket="<", endBracket="</>")
+        if index >= 0:
+            return match[:index]
 
 def getNextBlock( aString):
     startBracket="<"
@@ -377,6 +1090,122 @@ def getNextBlock( aString):
     return description, contents, rest
 
 
+# tokenizer for the <Item>/<list>/<param> serialization format
+blockTagPattern = re.compile(r'<(/?)(\w*)((?:\s+[\w-]+="[^"]*")*)\s*>')
+attributePattern = re.compile(r'([\w-]+)="([^"]*)"')
+
+class ParsedBlock:
+    def __init__(self, tag="", attributes=None, parent=None):
+        self.tag=tag
+        self.attributes=attributes if attributes is not None else dict()
+        self.parent=parent
+        self.children=[]
+        self.textParts=[]
+        self.parameterIndex=None
+        self.itemIndex=None
+
+    def getText(self):
+        return "".join(self.textParts)
+
+    def walk(self):
+        # all blocks below this one in document order
+        stack = list(reversed(self.children))
+        while len(stack)>0:
+            block = stack.pop()
+            yield block
+            stack.extend(reversed(block.children))
+
+    def getParameterIndex(self):
+        # name -> value string of all <param> blocks below this one. Built once, first occurrence wins.
+        if self.parameterIndex is None:
+            self.parameterIndex = dict()
+            for block in self.walk():
+                if block.tag == "param":
+                    self.parameterIndex.setdefault(block.attributes.get("name"), block.getText())
+        return self.parameterIndex
+
+    def getItemIndex(self):
+        # (class, name) -> <Item> block for all items below this one
+        if self.itemIndex is None:
+            self.itemIndex = dict()
+            for block in self.walk():
+                if block.tag == "Item":
+                    self.itemIndex.setdefault((block.attributes.get("class"), block.attributes.get("name")), block)
+        return self.itemIndex
+
+    def findParameter(self, name):
+        return self.getParameterIndex().get(name)
+
+    def findItem(self, className, name):
+        if self.tag == "Item" and self.attributes.get("class") == className and self.attributes.get("name") == name:
+            return self
+        return self.getItemIndex().get((className, name))
+
+
+class BlockParser:
+    # single pass parser that builds a block tree from serialized text. Text can be fed in chunks;
+    # top-level blocks are collected as soon as they are closed.
+    def __init__(self, keepBlocks=True):
+        self.root=ParsedBlock(tag="document")
+        self.current=self.root
+        self.keepBlocks=keepBlocks
+        self.completed=[]
+        self.pending=""
+
+    def addText(self, text):
+        if len(text)>0:
+            self.current.textParts.append(text)
+
+    def feed(self, text):
+        text = self.pending + text
+        self.pending = ""
+        position = 0
+        for match in blockTagPattern.finditer(text):
+            closing, tag, attributes = match.groups()
+            if not closing and len(tag) == 0:
+                continue # "<>" is not a tag
+            self.addText(text[position:match.start()])
+            position = match.end()
+            if closing:
+                if self.current.parent is not None:
+                    self.closeBlock()
+            else:
+                block = ParsedBlock(tag=tag, attributes=dict(attributePattern.findall(attributes)), parent=self.current)
+                self.current.children.append(block)
+                self.current = block
+        # keep a possibly incomplete tag at the end for the next chunk
+        tagStart = text.rfind("<", position)
+        if tagStart >= 0:
+            self.pending = text[tagStart:]
+            text = text[:tagStart]
+        self.addText(text[position:])
+        return self.root
+
+    def closeBlock(self):
+        block = self.current
+        self.current = block.parent
+        if self.current is self.root:
+            self.completed.append(block)
+            if not self.keepBlocks:
+                self.root.children.pop()
+                block.parent = None
+
+    def popCompleted(self):
+        completed = self.completed
+        self.completed = []
+        return completed
+
+    def close(self):
+        self.addText(self.pending)
+        self.pending = ""
+        return self.root
+
+def parseBlocks(aString):
+    parser = BlockParser()
+    parser.feed(aString)
+    return parser.close()
+
+
 def serializeParameterList(parameters):
     output = ""
 
@@ -398,11 +1227,39 @@ def exportRecursiveList(parameters):
         output.append(parameters.toDict())
     return output
 
-def itemsParser(inputString, classlist):
-    remain = inputString
-    #while len(remain)>0:
-    description, contents, remain = getNextBlock(remain)
-    print(description, contents, remain)
+def readChunks(input, chunkSize=65536):
+    # yields text chunks from a text or binary file-like object
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = input.read(chunkSize)
+        finished = len(chunk)==0
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk, final=finished)
+        if len(chunk)>0:
+            yield chunk
+        if finished:
+            return
+
+def itemsParser(input, classlist, chunkSize=65536, **creationArgs):
+    # generator reading serialized items from a string or a file/stream, yielding each item as soon as its block is complete
+    if isinstance(classlist, dict):
+        classes = classlist
+    else:
+        classes = dict([(c.__name__, c) for c in classlist])
+
+    if isinstance(input, str):
+        chunks = [input]
+    else:
+        chunks = readChunks(input, chunkSize)
+
+    parser = BlockParser(keepBlocks=False)
+    for chunk in chunks:
+        parser.feed(chunk)
+        for block in parser.popCompleted():
+            item = buildItemFromBlock(block, classes, **creationArgs)
+            if item is not None:
+                yield item
+    parser.close()
 
 
 def buildItemFromDict(itemDict, classes):
@@ -411,11 +1268,47 @@ def buildItemFromDict(itemDict, classes):
     item = classes[itemDict["type"]]
     return item
 
-def flattenRecursiveList(paramList):
-    output = []
+def buildItemFromBlock(itemBlock, classes, **creationArgs):
+    if itemBlock.tag != "Item":
+        return None
+    className = itemBlock.attributes.get("class")
+    if className not in classes:
+        print("unknown item class:", className)
+        return None
+    item = classes[className](name=itemBlock.attributes.get("name"), **creationArgs)
+    item.restoreParametersFromBlock(itemBlock, execute_callbacks=False)
+    return item
+
+def exportItemsDelta(items, sinceRevision=None):
+    # deltas of all items changed since the given revision (default: each item's last checkpoint)
+    return {"revision": nextRevision(), "items": [i.exportDelta(sinceRevision) for i in items if i.isDirty(sinceRevision)]}
+
+def applyItemsDelta(items, delta, classes=None, execute_callbacks=False, **creationArgs):
+    # apply an exportItemsDelta result to another item set, matched by (previous) name.
+    # Unknown items are created if their class is in classes; the new items are returned.
+    itemsByName = dict([(i.name.getValue(), i) for i in items])
+    createdItems = []
+    for itemDelta in delta["items"]:
+        item = itemsByName.get(itemDelta.get("previousName", itemDelta["name"]), itemsByName.get(itemDelta["name"]))
+        if item is None:
+            if classes is None or itemDelta["type"] not in classes:
+                print("no item for delta", itemDelta["name"])
+                continue
+            item = buildItemFromDict(itemDelta, classes)(name=itemDelta["name"], **creationArgs)
+            createdItems.append(item)
+        item.applyDelta(itemDelta, execute_callbacks)
+        itemsByName[item.name.getValue()] = item
+    return createdItems
+
+def iterRecursiveList(paramList):
     if isinstance(paramList, (list)):
         for p in paramList:
-            output+=flattenRecursiveList(p)
+            if isinstance(p, (list)):
+                yield from iterRecursiveList(p)
+            else:
+                yield p
     else:
-        output.append(paramList)
-    return output
+        yield paramList
+
+def flattenRecursiveList(paramList):
+    return list(iterRecursiveList(paramList))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# Headless benchmark suite for guifw.
+#
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --quick --compare results.json --threshold 0.2
+#
+# Results are written as JSON ({"meta": ..., "results": {case: {...}}}); with --compare the run is checked
+# against an earlier results file and the exit code is 1 if any case got slower than the threshold allows.
+# Qt runs on the offscreen platform; without PyQt5 the widget and list model cases are skipped.
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# benchmark the checkout this script is in, whatever its directory is called: the modules import each
+# other as guifw.*, so the repository root is registered as the guifw package
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+packageSpec = importlib.util.spec_from_file_location("guifw", os.path.join(repoRoot, "__init__.py"),
+                                                     submodule_search_locations=[repoRoot])
+sys.modules["guifw"] = importlib.util.module_from_spec(packageSpec)
+packageSpec.loader.exec_module(sys.modules["guifw"])
+
+from guifw.abstractparameters import *
+from guifw.binaryformat import saveItemsBinary, loadItemsBinary
+
+try:
+    from PyQt5 import QtWidgets
+    from guifw import gui_elements
+except ImportError:
+    QtWidgets = None
+
+
+class BenchItem(ItemWithParameters):
+    # item with a configurable number of parameters of the common types, every fifth one in a nested row
+    def __init__(self, name="item", parameterCount=10, **kwargs):
+        ItemWithParameters.__init__(self, name=name, **kwargs)
+        parameters = []
+        row = []
+        for i in range(parameterCount):
+            kind = i % 4
+            if kind == 0:
+                p = NumericalParameter(parent=self, name="number%i" % i, value=i * 0.5, min=0, max=1e6, step=0.1)
+            elif kind == 1:
+                p = TextParameter(parent=self, name="text%i" % i, value="value %i" % i)
+            elif kind == 2:
+                p = CheckboxParameter(parent=self, name="check%i" % i, value=(i % 3 == 0))
+            else:
+                p = ChoiceParameter(parent=self, name="choice%i" % i, choices=["a", "b", "c"], value="b")
+            if i % 5 == 4:
+                row.append(p)
+                parameters.append(row)
+                row = []
+            else:
+                parameters.append(p)
+        self.parameters = parameters
+
+classes = {"BenchItem": BenchItem}
+
+def makeItems(count, parameterCount=10):
+    return [BenchItem(name="item %i" % i, parameterCount=parameterCount) for i in range(count)]
+
+
+def measure(function, setup=None, repeats=3):
+    # runs setup() (untimed) and function(setupResult) repeats times, returns the timings in seconds
+    timings = []
+    for r in range(repeats):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+class Suite:
+    def __init__(self, repeats=3, verbose=True):
+        self.repeats = repeats
+        self.verbose = verbose
+        self.results = dict()
+
+    def run(self, name, size, function, setup=None):
+        timings = measure(function, setup, self.repeats)
+        result = {"size": size, "seconds": min(timings), "median": statistics.median(timings),
+                  "perUnit": min(timings) / size if size else None}
+        self.results["%s:%i" % (name, size)] = result
+        if self.verbose:
+            print("%-32s %8i %10.4f s %10.2f us/unit" % (name, size, result["seconds"], result["perUnit"] * 1e6), file=sys.stderr)
+        return result
+
+
+def serializationCases(suite, sizes):
+    for n in sizes:
+        items = makeItems(n)
+        text = "".join([i.serialize() for i in items])
+        suite.run("serialize", n, lambda a: [i.serialize() for i in items])
+        suite.run("deserialize", n, lambda a: list(itemsParser(io.StringIO(text), classes)))
+
+        dicts = [i.toDict() for i in items]
+        suite.run("toDict", n, lambda fresh: [i.toDict() for i in fresh], setup=lambda: makeItems(n))
+        suite.run("restoreParametersFromDict", n,
+                  lambda a: [i.restoreParametersFromDict(d["parameters"]) for i, d in zip(items, dicts)])
+
+        with tempfile.TemporaryDirectory() as directory:
+            jsonFile = os.path.join(directory, "items.json")
+            binaryFile = os.path.join(directory, "items.gfwb")
+
+            # same steps as ListWidget.saveTasks/loadTasks
+            def saveJson(fresh):
+                with open(jsonFile, "w") as file:
+                    file.write(json.dumps([i.toDict() for i in fresh]))
+
+            def loadJson(a):
+                with open(jsonFile) as file:
+                    for d in json.loads(file.read()):
+                        item = buildItemFromDict(d, classes)(name=d["name"])
+                        item.restoreParametersFromDict(d["parameters"])
+
+            suite.run("saveJson", n, saveJson, setup=lambda: makeItems(n))
+            suite.run("loadJson", n, loadJson)
+            suite.run("saveBinary", n, lambda a: saveItemsBinary(items, binaryFile))
+            suite.run("loadBinary", n, lambda a: list(loadItemsBinary(binaryFile, classes)))
+
+def widgetCases(suite, parameterCounts):
+    for count in parameterCounts:
+        item = BenchItem(parameterCount=count)
+        parameters = list(iterRecursiveList(item.parameters))
+
+        def buildWidgets(a):
+            for p in parameters:
+                gui_elements.parameterWidgetFactory(p).deleteLater()
+            QtWidgets.QApplication.processEvents()
+
+        def buildPanel(a):
+            w = gui_elements.ToolPropertyWidget(None, item)
+            w.close()
+            w.deleteLater()
+            QtWidgets.QApplication.processEvents()
+
+        suite.run("parameterWidgetFactory", count, buildWidgets)
+        suite.run("ToolPropertyWidget", count, buildPanel)
+
+def listModelCases(suite, sizes):
+    for n in sizes:
+        def newList():
+            listWidget = gui_elements.ListWidget(itemclass=BenchItem, itemlist=[])
+            return listWidget, makeItems(n, parameterCount=2)
+
+        def insert(arguments):
+            listWidget, items = arguments
+            for i in items:
+                listWidget.listmodel.addItem(i)
+
+        def filledList():
+            listWidget, items = newList()
+            insert((listWidget, items))
+            return listWidget
+
+        searches = min(n, 1000)
+        names = ["item %i" % (i * n // searches) for i in range(searches)]
+
+        def search(listWidget):
+            for name in names:
+                listWidget.findItem(name)
+
+        def remove(listWidget):
+            for i in range(searches):
+                listWidget.listmodel.removeRows(0, 1, None)
+
+        def addItems(arguments):
+            listWidget, items = arguments
+            listWidget.listmodel.addItems(items)
+
+        def removeItems(listWidget):
+            listWidget.listmodel.removeItems(range(0, n, 2))
+
+        suite.run("ItemListModel.insert", n, insert, setup=newList)
+        suite.run("ItemListModel.addItems", n, addItems, setup=newList)
+        suite.run("ItemListModel.search", n, search, setup=filledList)
+        suite.run("ItemListModel.remove", n, remove, setup=filledList)
+        suite.run("ItemListModel.removeItems", n, removeItems, setup=filledList)
+
+        def filterNames(listWidget):
+            for text in ["item 1", "item 12", "tem 123", ""]:
+                listWidget.filterModel.setFilterText(text)
+                listWidget.filterModel.rowCount()
+
+        suite.run("ItemFilterModel.filter", n, filterNames, setup=filledList)
+
+
+def compareResults(results, baseline, threshold):
+    # returns the list of (case, old seconds, new seconds) that got slower than 1 + threshold
+    regressions = []
+    for case, result in sorted(results.items()):
+        if case not in baseline:
+            continue
+        old = baseline[case]["seconds"]
+        new = result["seconds"]
+        ratio = new / old if old > 0 else 1.0
+        marker = ""
+        if ratio > 1.0 + threshold:
+            regressions.append((case, old, new))
+            marker = "  REGRESSION"
+        print("%-40s %10.4f -> %10.4f s  x%.2f%s" % (case, old, new, ratio, marker), file=sys.stderr)
+    return regressions
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="guifw benchmarks")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown for --compare (0.2 = 20%%)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="small sizes, for smoke runs")
+    parser.add_argument("--only", default="serialization,widgets,listmodel", help="comma separated groups to run")
+    args = parser.parse_args(arguments)
+
+    if args.quick:
+        itemSizes, parameterCounts, listSizes = [1000], [10, 100], [1000]
+    else:
+        itemSizes, parameterCounts, listSizes = [10000, 100000], [10, 100, 1000], [1000, 10000, 100000]
+    groups = args.only.split(",")
+
+    suite = Suite(repeats=args.repeats)
+    if "serialization" in groups:
+        serializationCases(suite, itemSizes)
+    if QtWidgets is None:
+        print("PyQt5 not available, skipping widget and list model benchmarks", file=sys.stderr)
+    else:
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+        if "widgets" in groups:
+            widgetCases(suite, parameterCounts)
+        if "listmodel" in groups:
+            listModelCases(suite, listSizes)
+
+    output = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeats": args.repeats, "quick": args.quick},
+              "results": suite.results}
+    data = json.dumps(output, indent=1)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(data)
+    else:
+        print(data)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        regressions = compareResults(suite.results, baseline, args.threshold)
+        if len(regressions) > 0:
+            print("%i regression(s) above %.0f%%" % (len(regressions), args.threshold * 100), file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
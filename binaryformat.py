@@ -0,0 +1,387 @@
+import datetime
+import mmap
+import numbers
+import os
+import struct
+from guifw.abstractparameters import *
+
+# Binary item list format
+#
+#   header:  magic "GFWB", version (u16)
+#   schemas: count (u32), then per schema: class name, parameter count (u32), parameter names
+#   items:   count (u32), then per item: record length (u32), schema id (u32), item name, one value per schema parameter
+#
+# Strings are stored as u32 length + utf-8 bytes, values as a type tag followed by the native value
+# (see EditableParameter.getNativeValue). All numbers are little endian.
+
+MAGIC = b"GFWB"
+VERSION = 1
+
+uint16 = struct.Struct("<H")
+uint32 = struct.Struct("<I")
+int64 = struct.Struct("<q")
+float64 = struct.Struct("<d")
+
+TAG_NONE = ord("N")
+TAG_TRUE = ord("T")
+TAG_FALSE = ord("F")
+TAG_INT = ord("i")
+TAG_BIGINT = ord("I")
+TAG_FLOAT = ord("d")
+TAG_STRING = ord("s")
+TAG_DATETIME = ord("t")
+TAG_LIST = ord("l")
+
+class BinaryWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writeUInt32(self, value):
+        self.buffer += uint32.pack(value)
+
+    def writeString(self, value):
+        data = value.encode("utf-8")
+        self.buffer += uint32.pack(len(data))
+        self.buffer += data
+
+    def writeValue(self, value):
+        if value is None:
+            self.buffer.append(TAG_NONE)
+        elif value is True or value is False:
+            self.buffer.append(TAG_TRUE if value else TAG_FALSE)
+        elif isinstance(value, numbers.Integral):
+            if -2**63 <= value < 2**63:
+                self.buffer.append(TAG_INT)
+                self.buffer += int64.pack(value)
+            else:
+                self.buffer.append(TAG_BIGINT)
+                self.writeString(str(value))
+        elif isinstance(value, numbers.Real):
+            self.buffer.append(TAG_FLOAT)
+            self.buffer += float64.pack(value)
+        elif isinstance(value, str):
+            self.buffer.append(TAG_STRING)
+            self.writeString(value)
+        elif isinstance(value, datetime.datetime):
+            self.buffer.append(TAG_DATETIME)
+            self.writeString(value.isoformat())
+        elif isinstance(value, (list, tuple)):
+            self.buffer.append(TAG_LIST)
+            self.writeUInt32(len(value))
+            for v in value:
+                self.writeValue(v)
+        else:
+            self.buffer.append(TAG_STRING)
+            self.writeString(str(value))
+
+
+class BinaryReader:
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def readUInt16(self):
+        value = uint16.unpack_from(self.data, self.offset)[0]
+        self.offset += 2
+        return value
+
+    def readUInt32(self):
+        value = uint32.unpack_from(self.data, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def readString(self):
+        length = self.readUInt32()
+        value = str(self.data[self.offset:self.offset + length], "utf-8")
+        self.offset += length
+        return value
+
+    def readValue(self):
+        tag = self.data[self.offset]
+        self.offset += 1
+        if tag == TAG_FLOAT:
+            value = float64.unpack_from(self.data, self.offset)[0]
+            self.offset += 8
+            return value
+        if tag == TAG_INT:
+            value = int64.unpack_from(self.data, self.offset)[0]
+            self.offset += 8
+            return value
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_STRING:
+            return self.readString()
+        if tag == TAG_LIST:
+            return [self.readValue() for i in range(self.readUInt32())]
+        if tag == TAG_DATETIME:
+            return datetime.datetime.fromisoformat(self.readString())
+        if tag == TAG_BIGINT:
+            return int(self.readString())
+        raise ValueError("invalid value tag %i at offset %i" % (tag, self.offset - 1))
+
+
+def itemSchema(item):
+    if isinstance(item, LazyItem):
+        return item.fileIndex.schemas[item.schemaId]
+    return (item.__class__.__name__, tuple([p.name for p in iterRecursiveList(item.parameters)]))
+
+def writeItems(items):
+    # encode a list of items, returns bytes
+    items = [i.item if isinstance(i, LazyItem) and i.item is not None else i for i in items]
+    schemas = dict()
+    itemSchemas = []
+    for item in items:
+        schema = itemSchema(item)
+        itemSchemas.append(schemas.setdefault(schema, len(schemas)))
+
+    writer = BinaryWriter()
+    writer.buffer += MAGIC
+    writer.buffer += uint16.pack(VERSION)
+    writer.writeUInt32(len(schemas))
+    for className, names in schemas.keys():
+        writer.writeString(className)
+        writer.writeUInt32(len(names))
+        for name in names:
+            writer.writeString(name)
+
+    writer.writeUInt32(len(items))
+    for item, schemaId in zip(items, itemSchemas):
+        recordStart = len(writer.buffer)
+        writer.writeUInt32(0) # record length, filled in below
+        writer.writeUInt32(schemaId)
+        writer.writeString(item.name.getValue())
+        if isinstance(item, LazyItem):
+            writer.buffer += item.getValueData() # not loaded, so values are unchanged
+        else:
+            for p in iterRecursiveList(item.parameters):
+                writer.writeValue(p.getNativeValue())
+        uint32.pack_into(writer.buffer, recordStart, len(writer.buffer) - recordStart)
+    return bytes(writer.buffer)
+
+def readHeader(reader):
+    # checks magic and version and returns the list of (class name, parameter names) schemas
+    if bytes(reader.data[0:4]) != MAGIC:
+        raise ValueError("not a binary item file")
+    reader.offset = 4
+    version = reader.readUInt16()
+    if version > VERSION:
+        raise ValueError("unsupported binary item file version %i" % version)
+    schemas = []
+    for i in range(reader.readUInt32()):
+        className = reader.readString()
+        names = tuple([reader.readString() for j in range(reader.readUInt32())])
+        schemas.append((className, names))
+    return schemas
+
+def restoreItemValues(item, names, reader):
+    # values are stored in schema order; items with a different parameter layout are matched by name
+    parameters = list(iterRecursiveList(item.parameters))
+    if len(parameters) == len(names) and all([p.name == n for p, n in zip(parameters, names)]):
+        for p in parameters:
+            p.updateValueByNative(reader.readValue(), execute_callbacks=False)
+    else:
+        parameterIndex = item.getParameterIndex()
+        for name in names:
+            value = reader.readValue()
+            if name in parameterIndex:
+                parameterIndex[name].updateValueByNative(value, execute_callbacks=False)
+
+def readItems(data, classes, **creationArgs):
+    # generator decoding items from bytes (or a memoryview/mmap) using a class name -> class registry
+    reader = BinaryReader(memoryview(data))
+    schemas = readHeader(reader)
+    for i in range(reader.readUInt32()):
+        recordEnd = reader.offset + reader.readUInt32()
+        className, names = schemas[reader.readUInt32()]
+        name = reader.readString()
+        if className not in classes:
+            print("unknown item class:", className)
+        else:
+            item = classes[className](name=name, **creationArgs)
+            restoreItemValues(item, names, reader)
+            yield item
+        reader.offset = recordEnd
+
+def saveItemsBinary(items, filename):
+    items = list(items)
+    data = writeItems(items)
+    tempname = filename + ".tmp"
+    with open(tempname, "wb") as file:
+        file.write(data)
+
+    # A mapped file can't be replaced on Windows: indexes of the file being overwritten are closed first,
+    # and their unloaded items are moved over to an index of the new file (records keep their position).
+    path = os.path.abspath(filename)
+    remapped = [(position, i) for position, i in enumerate(items) if isinstance(i, LazyItem) and i.item is None and i.fileIndex.path == path]
+    oldIndexes = set([i.fileIndex for position, i in remapped])
+    for fileIndex in oldIndexes:
+        fileIndex.close()
+    os.replace(tempname, filename)
+    if len(remapped) > 0:
+        oldIndex = remapped[0][1].fileIndex
+        newIndex = ItemFileIndex(filename, oldIndex.classes, **oldIndex.creationArgs)
+        for position, i in remapped:
+            i.fileIndex = newIndex
+            i.index = position
+        return newIndex
+    return None
+
+def loadItemsBinary(filename, classes, **creationArgs):
+    with open(filename, "rb") as file:
+        data = file.read()
+    return readItems(data, classes, **creationArgs)
+
+
+class ItemFileIndex:
+    # Memory-maps a binary item file and indexes the item records without decoding their values.
+    # headers holds (name, class name, offset) per item; items are built on demand by loadItem.
+    # The file stays open and mapped until close().
+    def __init__(self, filename, classes, **creationArgs):
+        self.path = os.path.abspath(filename)
+        self.classes = classes
+        self.creationArgs = creationArgs
+        self.closed = False
+        self.prototypes = dict() # class name -> (item with default values, scratch item) for peekParameter
+        self.file = open(filename, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+        reader = BinaryReader(self.view)
+        self.schemas = readHeader(reader)
+        self.headers = []
+        self.schemaIds = []
+        for i in range(reader.readUInt32()):
+            offset = reader.offset
+            recordEnd = offset + reader.readUInt32()
+            schemaId = reader.readUInt32()
+            self.headers.append((reader.readString(), self.schemas[schemaId][0], offset))
+            self.schemaIds.append(schemaId)
+            reader.offset = recordEnd
+
+    def __len__(self):
+        return len(self.headers)
+
+    def getValueData(self, index):
+        # raw encoded values of an item record
+        reader = BinaryReader(self.view, self.headers[index][2])
+        recordEnd = reader.offset + reader.readUInt32()
+        reader.readUInt32()
+        reader.readString()
+        return bytes(self.view[reader.offset:recordEnd])
+
+    def loadItem(self, index):
+        name, className, offset = self.headers[index]
+        if className not in self.classes:
+            print("unknown item class:", className)
+            return None
+        reader = BinaryReader(self.view, offset)
+        reader.readUInt32()
+        names = self.schemas[reader.readUInt32()][1]
+        reader.readString()
+        item = self.classes[className](name=name, **self.creationArgs)
+        restoreItemValues(item, names, reader)
+        return item
+
+    def peekParameter(self, index, parameterName):
+        # The parameter as loadItem(index) would restore it, without building the item: the stored value
+        # is applied to a scratch item of the class. The result is only valid until the next call and
+        # must not be modified. None if the class or parameter is unknown.
+        name, className, offset = self.headers[index]
+        if className not in self.classes:
+            return None
+        if className not in self.prototypes:
+            self.prototypes[className] = (self.classes[className](name=name, **self.creationArgs),
+                                          self.classes[className](name=name, **self.creationArgs))
+        defaults, scratch = self.prototypes[className]
+        reader = BinaryReader(self.view, offset)
+        reader.readUInt32()
+        names = self.schemas[reader.readUInt32()][1]
+        if parameterName not in names: # not stored, so the item would keep its default
+            return defaults.getParameter(parameterName)
+        p = scratch.getParameter(parameterName)
+        if p is None:
+            return None
+        reader.readString()
+        for i in range(names.index(parameterName)):
+            reader.readValue()
+        p.updateValueByNative(reader.readValue(), execute_callbacks=False)
+        return p
+
+    def getLazyItems(self):
+        return [LazyItem(self, i) for i in range(len(self.headers))]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+
+class LazyItem:
+    # Stands in for an item of an ItemFileIndex. Name and selection state are available right away;
+    # accessing anything else loads the item and forwards to it.
+    def __init__(self, fileIndex, index):
+        self.fileIndex = fileIndex
+        self.index = index
+        self.item = None
+        self.name = TextParameter(name="Name", value=fileIndex.headers[index][0])
+        self.selected = False
+        self.savedRevision = 0
+
+    @property
+    def className(self):
+        return self.fileIndex.headers[self.index][1]
+
+    @property
+    def schemaId(self):
+        return self.fileIndex.schemaIds[self.index]
+
+    def materialize(self):
+        if self.item is None:
+            item = self.fileIndex.loadItem(self.index)
+            if item is None:
+                return None
+            renamed = self.isDirty()
+            item.selected = self.selected
+            item.checkpoint()
+            # the item takes over the name parameter, so observers of it (like the list model's name index) stay valid
+            item.name = self.name
+            item.name.parent = item
+            if renamed: # renamed before loading, still unsaved
+                item.name.markDirty()
+            self.item = item
+        return self.item
+
+    def getValueData(self):
+        return self.fileIndex.getValueData(self.index)
+
+    def peekParameter(self, name):
+        # read-only look at a parameter value without loading the item (see ItemFileIndex.peekParameter)
+        if self.item is not None:
+            return self.item.getParameter(name)
+        return self.fileIndex.peekParameter(self.index, name)
+
+    # an item that was never loaded has no unsaved parameter changes
+    def checkpoint(self):
+        if self.item is not None:
+            return self.item.checkpoint()
+        self.savedRevision = nextRevision()
+        return self.savedRevision
+
+    def isDirty(self, sinceRevision=None):
+        if self.item is not None:
+            return self.item.isDirty(sinceRevision)
+        if sinceRevision is None:
+            sinceRevision = self.savedRevision
+        return self.name.revision > sinceRevision
+
+    def __getattr__(self, attribute):
+        item = self.materialize()
+        if item is None:
+            raise AttributeError(attribute)
+        return getattr(item, attribute)
@@ -10,15 +10,75 @@ Refer to the file LICENSE.TXT which should be included in all distributions of t
 
 from PyQt5 import Qt, QtGui, QtCore, QtWidgets
 from PyQt5.QtWidgets import *
+import bisect
 import math
 import sys
+import time
 import traceback
 from importlib import *
 import json
+from collections import OrderedDict
 from guifw.abstractparameters import  *
+from guifw.binaryformat import saveItemsBinary, loadItemsBinary, ItemFileIndex, LazyItem
+from guifw import instrumentation
 from PIL import Image
 import numpy as np
-import gc
+
+class MainThreadDispatcher(QtCore.QObject):
+    # runs functions posted from any thread in the thread this object lives in (the GUI thread)
+    posted = QtCore.pyqtSignal(object)
+
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        self.posted.connect(self.run, QtCore.Qt.QueuedConnection)
+
+    def run(self, function):
+        try:
+            function()
+        except Exception:
+            traceback.print_exc()
+
+    def post(self, function):
+        self.posted.emit(function)
+
+mainThreadDispatcher = MainThreadDispatcher()
+setResultDispatcher(mainThreadDispatcher.post)
+
+class FrameUpdater(QtCore.QObject):
+    # Calls the registered drain functions once per frame (about 60 Hz) in the GUI thread. The timer
+    # stops when no parameter updates or progress are pending, and is restarted by the next post.
+    def __init__(self, interval=16):
+        QtCore.QObject.__init__(self)
+        self.drains = []
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.update)
+
+    def addDrain(self, drain):
+        if drain not in self.drains:
+            self.drains.append(drain)
+        if QtCore.QCoreApplication.instance() is not None:
+            self.start()
+
+    def start(self):
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def update(self):
+        for drain in self.drains:
+            try:
+                drain()
+            except Exception:
+                traceback.print_exc()
+        if len(parameterUpdates) == 0 and not hasPendingProgress():
+            self.timer.stop()
+
+frameUpdater = FrameUpdater()
+frameUpdater.drains.append(parameterUpdates.drain)
+frameUpdater.drains.append(deliverProgress)
+# the first value posted from a background thread starts the frame timer in the GUI thread
+parameterUpdates.onPending = lambda: mainThreadDispatcher.post(frameUpdater.start)
+setProgressPendingHandler(lambda: mainThreadDispatcher.post(frameUpdater.start))
 
 class HorizontalBar(QWidget):
     def __init__(self,  parent=None):
@@ -107,8 +167,7 @@ class LabeledComboField(QWidget):
         self.choices = choices
         self.setContentsMargins(0,0,0,0)
         self.layout.setSpacing(0)
-        for t in choices:
-            self.combo.addItem(t)
+        self.combo.addItems(choices)
         if value!=None and value in choices:
             self.combo.setCurrentIndex(choices.index(value))
         self.layout.addWidget(self.combo)
@@ -116,25 +175,22 @@ class LabeledComboField(QWidget):
     def updateFromParameter(self, parameter):
         if parameter!=None:
             self.updateChoices(parameter.getChoiceStrings())
-            self.updateValue(parameter.getValueString())
+            self.combo.setCurrentIndex(parameter.getIndex()) # -1 clears the combo box
 
     def updateValue(self,  value):
         if value!=None:
             self.combo.setCurrentIndex(self.choices.index(value))
 
     def updateChoices(self, choices):
-        changed = False
-        for mc, nc in zip(self.choices, choices):
-            if mc != nc:
-                changed = True
-        if not changed:
+        if self.choices == choices:
             return
 
         self.choices = choices
+        # rebuild in one go without emitting index changes for the intermediate states
+        self.combo.blockSignals(True)
         self.combo.clear()
-
-        for t in choices:
-            self.combo.addItem(t)
+        self.combo.addItems(choices)
+        self.combo.blockSignals(False)
 
 class LabeledTextField(QWidget):
     def __init__(self, parent=None, editable=True,  label="", value=None,  formatString="{:s}"):
@@ -149,7 +205,7 @@ class LabeledTextField(QWidget):
         self.text.setReadOnly(not self.editable)
         self.text.returnPressed.connect(self.textEditedHandler)
         self.edited_callback=None
-        self.edited_callback_argument=self
+        self.edited_callback_argument=None # None passes the field itself (not stored, to avoid a reference cycle)
 
         self.setContentsMargins(0,0,0,0)
         self.layout.setSpacing(0)
@@ -173,7 +229,7 @@ class LabeledTextField(QWidget):
 
     def textEditedHandler(self):
         if self.edited_callback is not None:
-            self.edited_callback(self.edited_callback_argument)
+            self.edited_callback(self if self.edited_callback_argument is None else self.edited_callback_argument)
 
     def closeEvent(self, ev):
         self.edited_callback=None
@@ -195,11 +251,13 @@ class LabeledProgressField(QWidget):
     def updateFromParameter(self, parameter):
         if parameter!=None:
             self.updateValue(parameter.getValue(),  parameter.min,  parameter.max)
+            self.progress.setFormat(parameter.getStatusText())
 
     def updateValue(self,  value,  min,  max):
-        self.progress.setMinimum(min)
-        self.progress.setMaximum(max)
-        self.progress.setValue(value)
+        self.progress.setMinimum(int(min) if min is not None else 0)
+        self.progress.setMaximum(int(max) if max is not None else 100)
+        if value is not None:
+            self.progress.setValue(int(value))
 
 
 class LabeledCheckboxField(QWidget):
@@ -330,7 +388,7 @@ class LabeledNumberField(QWidget):
                     self.slider.setMinimum(min/self.step)
                 if max != None:
                     self.slider.setMaximum(max/self.step)
-                self.slider.setValue(value/self.step)
+                self.slider.setValue(int(value/self.step))
             
             self.slider.valueChanged.connect(self.sliderChanged)
             labelednumber_widget = QtWidgets.QWidget(parent=self)
@@ -366,7 +424,65 @@ class LabeledNumberField(QWidget):
     def updateValue(self,  value):
         self.number.setValue(value)
         if self.slider is not None:
-            self.slider.setValue(value/self.step)
+            self.slider.setValue(int(value/self.step))
+
+    def setRange(self, min, max):
+        # same limits as set up in __init__ (None: practically unbounded)
+        self.number.setMinimum(min if min is not None else -10000000)
+        self.number.setMaximum(max if max is not None else 10000000)
+        if self.slider is not None:
+            if min is not None:
+                self.slider.setMinimum(int(min/self.step))
+            if max is not None:
+                self.slider.setMaximum(int(max/self.step))
+
+class CallbackLimiter(QtCore.QObject):
+    # Sits between a number widget and its NumericalParameter and applies the parameter's RatePolicy:
+    # values are stored right away, the callback runs as often as the policy allows.
+    def __init__(self, parameter, policy, slider=None, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self.parameter = parameter
+        self.policy = policy
+        self.slider = slider
+        self.pending = False
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.timeout)
+        if slider is not None:
+            slider.sliderReleased.connect(self.flush)
+
+    def valueChanged(self, value):
+        self.parameter.updateValueOnly(self.parameter.constrainValue(value))
+        mode = self.policy.mode
+        if mode == RatePolicy.DEBOUNCE:
+            self.pending = True
+            self.timer.start(int(self.policy.interval * 1000))
+        elif mode == RatePolicy.THROTTLE:
+            if self.timer.isActive():
+                self.pending = True
+            else:
+                self.fire()
+                self.timer.start(int(self.policy.interval * 1000))
+        elif mode == RatePolicy.RELEASE and self.slider is not None and self.slider.isSliderDown():
+            self.pending = True
+        else:
+            self.fire()
+
+    def timeout(self):
+        if self.pending:
+            self.fire()
+            if self.policy.mode == RatePolicy.THROTTLE:
+                self.timer.start(int(self.policy.interval * 1000))
+
+    def flush(self):
+        # run a held back callback now (slider released)
+        if self.pending:
+            self.timer.stop()
+            self.fire()
+
+    def fire(self):
+        self.pending = False
+        self.parameter.runCallback()
 
 class ClickableLabel(QLabel):
     clicked = QtCore.pyqtSignal()
@@ -468,60 +584,187 @@ class LabeledImageField(QWidget):
         self.label.close()
         self.label=None
 
-def parameterWidgetFactory(object, parent = None):
-    w = None
-    if object.__class__.__name__ == "TextParameter":
-        w = LabeledTextField(parent=parent, label=object.name, editable=object.editable, formatString=object.formatString)
-
-        w.updateValue(object.value)
-        if object.editable:
-            w.text.textChanged.connect(object.updateValueOnly)
-            w.text.editingFinished.connect(object.commitValue)
-
-    if object.__class__.__name__ == "FileParameter":
-        w = LabeledFileField(parent=parent, label=object.name, editable=object.editable, type = object.type, fileSelectionPattern=object.fileSelectionPattern)
-        w.updateValue(object.value)
-        if object.editable:
-            w.text.textChanged.connect(object.updateValue)
-
-    if object.__class__.__name__ == "CheckboxParameter":
-        w = LabeledCheckboxField(parent=parent, label=object.name, value=object.getValue(), editable=object.editable)
-        w.checkbox.stateChanged.connect(object.updateValue)
-
-    if object.__class__.__name__ == "NumericalParameter":
-        w = LabeledNumberField(parent=parent, label=object.name, min=object.min, max=object.max, value=object.getValue(), step=object.step, slider = object.slider, editable=object.editable)
-
-        if object.editable:
-            w.number.valueChanged.connect(object.updateValueQT)
-
-    if object.__class__.__name__ == "DateParameter":
-        w = LabeledTextField(parent=parent, label=object.name, editable=object.editable, formatString="{:s}")
-        w.updateValue(str(object.value))
-        #if object.editable:
-        #    w.text.textChanged.connect(object.updateValueOnly)
-        #    w.text.editingFinished.connect(object.commitValue)
-
-    if object.__class__.__name__ == "ProgressParameter":
-        w = LabeledProgressField(parent=parent, label=object.name, min=object.min, max=object.max, value=object.getValue())
-
-    if object.__class__.__name__ == "ChoiceParameter":
-        w = LabeledComboField(parent=parent, label=object.name, value=object.getValueString(),
-                              choices=object.getChoiceStrings())
-        if object.editable:
-            w.combo.currentIndexChanged.connect(
-                object.updateValueByIndex)
-
-    if object.__class__.__name__ == "ActionParameter":
-        w = QtWidgets.QPushButton(parent = parent, text=object.name)
-        w.clicked.connect(object.callback)
-        w.updateFromParameter=None
-
-    if object.__class__.__name__ == "ImageViewer":
-        w = LabeledImageField(parent=parent, label = object.name, image = object.getValue(), height = object.height)
+# Widget registry: parameter class -> (builder, binder). builder(parameter, parent) creates the editor
+# widget, binder(widget, parameter) shows the parameter's value in it and connects it (see connectBinding).
+# Lookup follows the MRO, so subclasses of registered parameter classes get their base class's widget.
+parameterWidgets = dict()
+parameterWidgetCache = dict()
+
+def registerParameterWidget(parameterClass, builder, binder=None):
+    parameterWidgets[parameterClass] = (builder, binder)
+    parameterWidgetCache.clear()
+
+def getParameterWidgetEntry(parameterClass):
+    entry = parameterWidgetCache.get(parameterClass)
+    if entry is None:
+        for c in parameterClass.__mro__:
+            if c in parameterWidgets:
+                entry = parameterWidgetCache[parameterClass] = parameterWidgets[c]
+                break
+        else:
+            raise TypeError("no widget registered for %s" % parameterClass.__name__)
+    return entry
+
+def buildParameterWidget(object, parent = None):
+    # creates the editor widget for a parameter; bindParameterWidget connects it
+    w = getParameterWidgetEntry(object.__class__)[0](object, parent)
+    w.bindings = []
+    w.boundParameter = None
+    return w
 
+def connectBinding(w, signal, slot):
+    signal.connect(slot)
+    w.bindings.append((signal, slot))
+
+def bindParameterWidget(w, object):
+    # Show the parameter's value in a widget built by buildParameterWidget and connect the widget to it.
+    # The value is pushed before connecting, so rebinding a widget does not fire callbacks.
+    unbindParameterWidget(w)
+    w.boundParameter = object
+    binder = getParameterWidgetEntry(object.__class__)[1]
+    if binder is not None:
+        binder(w, object)
     object.viewRefresh = w.updateFromParameter
+
+def buildTextWidget(object, parent):
+    return LabeledTextField(parent=parent, label=object.name, editable=object.editable, formatString=object.formatString)
+
+def bindTextWidget(w, object):
+    w.text.setText("")
+    w.updateValue(object.value)
+    if object.editable:
+        connectBinding(w, w.text.textChanged, object.updateValueOnly)
+        connectBinding(w, w.text.editingFinished, object.commitValue)
+
+def buildFileWidget(object, parent):
+    return LabeledFileField(parent=parent, label=object.name, editable=object.editable, type = object.type, fileSelectionPattern=object.fileSelectionPattern)
+
+def bindFileWidget(w, object):
+    w.text.setText("")
+    w.updateValue(object.value)
+    if object.editable:
+        connectBinding(w, w.text.textChanged, object.updateValue)
+
+def buildCheckboxWidget(object, parent):
+    return LabeledCheckboxField(parent=parent, label=object.name, value=object.getValue(), editable=object.editable)
+
+def bindCheckboxWidget(w, object):
+    w.updateValue(object.getValue())
+    connectBinding(w, w.checkbox.stateChanged, object.updateValue)
+
+def buildNumberWidget(object, parent):
+    return LabeledNumberField(parent=parent, label=object.name, min=object.min, max=object.max, value=object.getValue(), step=object.step, slider = object.slider, editable=object.editable)
+
+def bindNumberWidget(w, object):
+    w.setRange(object.min, object.max) # the range is not part of recycleKey, so a reused widget may have another one
+    w.updateValue(object.getValue())
+    if object.editable:
+        if object.ratePolicy is None or object.ratePolicy.mode == RatePolicy.IMMEDIATE:
+            connectBinding(w, w.number.valueChanged, object.updateValueQT)
+        else:
+            w.limiter = CallbackLimiter(object, object.ratePolicy, slider=w.slider, parent=w)
+            connectBinding(w, w.number.valueChanged, w.limiter.valueChanged)
+
+def buildDateWidget(object, parent):
+    return LabeledTextField(parent=parent, label=object.name, editable=object.editable, formatString="{:s}")
+
+def bindDateWidget(w, object):
+    w.updateValue(str(object.value))
+    #if object.editable:
+    #    w.text.textChanged.connect(object.updateValueOnly)
+    #    w.text.editingFinished.connect(object.commitValue)
+
+def buildComputedWidget(object, parent):
+    return LabeledTextField(parent=parent, label=object.name, editable=False, formatString=object.formatString)
+
+def bindComputedWidget(w, object):
+    w.text.setText("")
+    w.updateValue(object.getValue())
+
+def buildProgressWidget(object, parent):
+    return LabeledProgressField(parent=parent, label=object.name, min=object.min, max=object.max, value=object.getValue())
+
+def bindProgressWidget(w, object):
+    w.updateFromParameter(object)
+
+def buildComboWidget(object, parent):
+    return LabeledComboField(parent=parent, label=object.name, value=object.getValueString(), choices=object.getChoiceStrings())
+
+def bindComboWidget(w, object):
+    w.updateFromParameter(object)
+    if object.editable:
+        connectBinding(w, w.combo.currentIndexChanged, object.updateValueByIndex)
+
+def buildActionWidget(object, parent):
+    w = QtWidgets.QPushButton(parent = parent, text=object.name)
+    w.updateFromParameter=None
+    return w
+
+def bindActionWidget(w, object):
+    connectBinding(w, w.clicked, object.callback)
+
+def buildImageWidget(object, parent):
+    return LabeledImageField(parent=parent, label = object.name, height = object.height)
+
+def bindImageWidget(w, object):
+    w.updateFromParameter(object)
+
+registerParameterWidget(TextParameter, buildTextWidget, bindTextWidget)
+registerParameterWidget(FileParameter, buildFileWidget, bindFileWidget)
+registerParameterWidget(CheckboxParameter, buildCheckboxWidget, bindCheckboxWidget)
+registerParameterWidget(NumericalParameter, buildNumberWidget, bindNumberWidget)
+registerParameterWidget(DateParameter, buildDateWidget, bindDateWidget)
+registerParameterWidget(ComputedParameter, buildComputedWidget, bindComputedWidget)
+registerParameterWidget(ProgressParameter, buildProgressWidget, bindProgressWidget)
+registerParameterWidget(ChoiceParameter, buildComboWidget, bindComboWidget)
+registerParameterWidget(ActionParameter, buildActionWidget, bindActionWidget)
+registerParameterWidget(ImageViewer, buildImageWidget, bindImageWidget)
+
+def unbindParameterWidget(w):
+    # disconnect a widget from its parameter, so the widget can be reused or dropped
+    for signal, slot in w.bindings:
+        try:
+            signal.disconnect(slot)
+        except TypeError:
+            pass
+    w.bindings = []
+    if getattr(w, "limiter", None) is not None:
+        w.limiter.flush() # a held back callback still has to run for the value already stored
+        w.limiter.timer.stop()
+        w.limiter.deleteLater()
+        w.limiter = None
+    p = w.boundParameter
+    if p is not None and getattr(p.viewRefresh, "__wrapped__", p.viewRefresh) == w.updateFromParameter:
+        p.viewRefresh = None
+    w.boundParameter = None
+
+def parameterWidgetFactory(object, parent = None):
+    w = buildParameterWidget(object, parent=parent)
+    bindParameterWidget(w, object)
     return w
 
+# parameter attributes that change the structure of the widgets; parameters that agree on these can share
+# a widget. Value ranges are left out, binding sets them (they can change at runtime).
+layoutAttributes = ("editable", "step", "slider", "formatString", "type", "fileSelectionPattern", "height")
+
+def layoutSignature(parameters):
+    # hashable description of the widget layout of a (nested) parameter list
+    if isinstance(parameters, list):
+        return tuple([layoutSignature(p) for p in parameters])
+    return (parameters.__class__.__name__, parameters.name) + tuple([getattr(parameters, a, None) for a in layoutAttributes])
+
+def recycleKey(parameter):
+    # like layoutSignature without the name: a widget can be relabeled (setWidgetLabel) and reused for any parameter with this key
+    return (parameter.__class__.__name__,) + tuple([getattr(parameter, a, None) for a in layoutAttributes])
+
+def setWidgetLabel(w, label):
+    if isinstance(w, QtWidgets.QPushButton):
+        w.setText(label)
+    elif isinstance(w, LabeledCheckboxField):
+        w.checkbox.setText(label)
+    elif isinstance(getattr(w, "label", None), QtWidgets.QLabel):
+        w.label.setText(label)
+
 class ToolPropertyWidget(QWidget):
     def updateParameter(self,  object=None,  newValue=None):
         object.updateValue(newValue)
@@ -543,8 +786,9 @@ class ToolPropertyWidget(QWidget):
         self.scrollcontent.setLayout(self.layout)
         self.scroll.setWidget(self.scrollcontent)
 
-
+        self.tool = tool
         self.parameters=dict()
+        self.widgets = [] # in parameter order, for rebinding
         self.addToolWidgets(self.layout,  tool.parameters)
         self.layout.addStretch()
 
@@ -564,6 +808,7 @@ class ToolPropertyWidget(QWidget):
             else:
                 w = parameterWidgetFactory(object, parent = self)
                 self.parameters[p] = w
+                self.widgets.append(w)
                 layout.addWidget(w)
 
             if w is not None:
@@ -573,21 +818,488 @@ class ToolPropertyWidget(QWidget):
         layout.setSpacing(0);
         #layout.addStretch()
 
-    def closeEvent(self, ev):
-        for p in self.parameters.keys():
-            p.viewRefresh = None
-            self.parameters[p].close()
+    def rebind(self, tool):
+        # show another item with the same layout (see layoutSignature) in the existing widgets
+        self.unbind()
+        self.tool = tool
+        for p, w in zip(iterRecursiveList(tool.parameters), self.widgets):
+            bindParameterWidget(w, p)
+            self.parameters[p] = w
+
+    def unbind(self):
+        for w in self.widgets:
+            unbindParameterWidget(w)
         self.parameters.clear()
+        self.tool = None
+
+    def closeEvent(self, ev):
+        self.unbind()
+        for w in self.widgets:
+            w.close()
+        self.widgets = []
         self.scroll.close()
         self.scroll = None
         self.scrollcontent.close()
         self.scrollcontent=None
 
+class VirtualPropertyWidget(QWidget):
+    # Property panel for items with very many parameters. Only rows in or near the visible part of the
+    # scroll area get editor widgets; editors of rows scrolled out are unbound and reused for rows
+    # scrolled in. Top level entries are rows; nested lists are shown side by side in one row, deeper
+    # levels as nested horizontal groups (as in ToolPropertyWidget).
+    # Row positions come from prefix sums of the row heights, measured once per kind of editor.
+    overscan = 200 # pixels above and below the viewport that stay populated
+    defaultRowHeight = 30
+
+    def __init__(self, parent, tool):
+        QWidget.__init__(self, parent=parent)
+        self.scroll = QtWidgets.QScrollArea(parent=self)
+        self.scroll.setWidgetResizable(True)
+        self.outer_layout = QtWidgets.QVBoxLayout(self)
+        self.outer_layout.addWidget(self.scroll)
+        self.scroll.setVerticalScrollBarPolicy(Qt.Qt.ScrollBarAsNeeded)
+        self.scroll.setHorizontalScrollBarPolicy(Qt.Qt.ScrollBarAlwaysOff)
+        self.scrollcontent = QtWidgets.QWidget(self.scroll)
+        self.scroll.setWidget(self.scrollcontent)
+        self.scrollcontent.installEventFilter(self)
+        self.scroll.viewport().installEventFilter(self)
+        self.scroll.verticalScrollBar().valueChanged.connect(self.updateVisibleRows)
+
+        self.freeEditors = dict() # recycleKey -> unbound editors
+        self.freeRows = []
+        self.rowHeights = dict() # recycleKey -> measured editor height
+        self.visibleRows = dict() # row index -> (row widget, editors, group widgets)
+        self.parameters = dict() # parameter -> editor, for the visible rows
+        self.rows = []
+        self.offsets = [0]
+        self.tool = None
+        self.setTool(tool)
+
+    def setTool(self, tool):
+        self.tool = tool
+        self.rows = [p if isinstance(p, list) else [p] for p in tool.parameters]
+        self.updateOffsets()
+        self.updateVisibleRows()
+
+    def rebind(self, tool):
+        self.unbind()
+        self.setTool(tool)
+
+    def unbind(self):
+        for index in list(self.visibleRows.keys()):
+            self.releaseRow(index)
+        self.tool = None
+        self.rows = []
+
+    def rowHeight(self, row):
+        return max([self.rowHeights.get(recycleKey(p), self.defaultRowHeight) for p in iterRecursiveList(row)] + [1])
+
+    def updateOffsets(self):
+        self.offsets = [0]
+        for row in self.rows:
+            self.offsets.append(self.offsets[-1] + self.rowHeight(row))
+        self.scrollcontent.setMinimumHeight(self.offsets[-1])
+
+    def updateVisibleRows(self, dummy=None):
+        top = self.scroll.verticalScrollBar().value() - self.overscan
+        bottom = top + self.scroll.viewport().height() + 2 * self.overscan
+        first = max(0, bisect.bisect_right(self.offsets, top) - 1)
+        last = min(len(self.rows), bisect.bisect_left(self.offsets, bottom))
+        for index in list(self.visibleRows.keys()):
+            if index < first or index >= last:
+                self.releaseRow(index)
+        measured = False
+        for index in range(first, last):
+            if index not in self.visibleRows:
+                measured = self.createRow(index) or measured
+        if measured:
+            # first editor of a kind: row heights changed, so positions and the visible range may have too
+            self.updateOffsets()
+            self.updateVisibleRows()
+        else:
+            self.layoutRows()
+
+    def createRow(self, index):
+        if len(self.freeRows) > 0:
+            rowWidget = self.freeRows.pop()
+        else:
+            rowWidget = QWidget(self.scrollcontent)
+            rowLayout = QtWidgets.QHBoxLayout(rowWidget)
+            rowLayout.setContentsMargins(0, 0, 0, 0)
+            rowLayout.setSpacing(0)
+        editors = []
+        groups = []
+        measured = self.addEditors(rowWidget, self.rows[index], editors, groups)
+        self.visibleRows[index] = (rowWidget, editors, groups)
+        rowWidget.show()
+        return measured
+
+    def addEditors(self, groupWidget, parameters, editors, groups):
+        # fill a row (or a nested group) with editors, returns True if a new kind of editor was measured
+        measured = False
+        for p in parameters:
+            if isinstance(p, list):
+                nestedWidget = QWidget(groupWidget)
+                nestedLayout = QtWidgets.QHBoxLayout(nestedWidget)
+                nestedLayout.setContentsMargins(0, 0, 0, 0)
+                nestedLayout.setSpacing(0)
+                groupWidget.layout().addWidget(nestedWidget)
+                groups.append(nestedWidget)
+                measured = self.addEditors(nestedWidget, p, editors, groups) or measured
+                continue
+            w = self.getEditor(p, groupWidget)
+            groupWidget.layout().addWidget(w)
+            editors.append(w)
+            key = recycleKey(p)
+            if key not in self.rowHeights:
+                self.rowHeights[key] = w.sizeHint().height()
+                measured = True
+        return measured
+
+    def getEditor(self, p, rowWidget):
+        free = self.freeEditors.get(recycleKey(p))
+        if free:
+            w = free.pop()
+            w.setParent(rowWidget)
+            setWidgetLabel(w, p.name)
+        else:
+            w = buildParameterWidget(p, parent=rowWidget)
+        bindParameterWidget(w, p)
+        self.parameters[p] = w
+        w.show()
+        return w
+
+    def releaseRow(self, index):
+        rowWidget, editors, groups = self.visibleRows.pop(index)
+        for w in editors:
+            p = w.boundParameter
+            unbindParameterWidget(w)
+            self.parameters.pop(p, None)
+            w.parentWidget().layout().removeWidget(w)
+            w.hide()
+            w.setParent(self.scrollcontent)
+            self.freeEditors.setdefault(recycleKey(p), []).append(w)
+        for groupWidget in groups: # nested groups are rare, so they are not reused
+            groupWidget.parentWidget().layout().removeWidget(groupWidget)
+            groupWidget.hide()
+            groupWidget.deleteLater()
+        rowWidget.hide()
+        self.freeRows.append(rowWidget)
+
+    def layoutRows(self):
+        width = self.scrollcontent.width()
+        for index, (rowWidget, editors, groups) in self.visibleRows.items():
+            rowWidget.setGeometry(0, self.offsets[index], width, self.offsets[index + 1] - self.offsets[index])
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Resize:
+            if watched is self.scrollcontent:
+                self.layoutRows()
+            else:
+                self.updateVisibleRows()
+        return False
+
+    def closeEvent(self, ev):
+        self.unbind()
+        for editors in self.freeEditors.values():
+            for w in editors:
+                w.close()
+        self.freeEditors.clear()
+        self.scroll.close()
+        self.scroll = None
+        self.scrollcontent.close()
+        self.scrollcontent=None
+
+class PropertyPanelPool:
+    # Keeps the property panels of recently shown item layouts. Items of the same class and parameter
+    # layout share a panel, which is rebound to the selected item instead of being rebuilt.
+    # The least recently used panels are closed when there are more than size. Items with more than
+    # virtualThreshold parameters get a VirtualPropertyWidget.
+    def __init__(self, parent=None, size=4, virtualThreshold=None):
+        self.parent = parent
+        self.size = max(1, size) # the panel being shown is always kept
+        self.virtualThreshold = virtualThreshold
+        self.panels = OrderedDict()
+
+    def createPanel(self, tool):
+        if self.virtualThreshold is not None and len(list(iterRecursiveList(tool.parameters))) > self.virtualThreshold:
+            return VirtualPropertyWidget(parent=self.parent, tool=tool)
+        return ToolPropertyWidget(parent=self.parent, tool=tool)
+
+    def getPanel(self, tool):
+        key = (tool.__class__, layoutSignature(tool.parameters))
+        panel = self.panels.pop(key, None)
+        if panel is None:
+            panel = self.createPanel(tool)
+        elif panel.tool is not tool:
+            panel.rebind(tool)
+        self.panels[key] = panel
+        while len(self.panels) > self.size:
+            key, oldPanel = self.panels.popitem(last=False)
+            oldPanel.close()
+            oldPanel.deleteLater()
+        return panel
+
+    def release(self, panel):
+        # hide a panel and detach it from its item; it stays in the pool for reuse
+        panel.hide()
+        panel.unbind()
+
+    def clear(self):
+        for panel in self.panels.values():
+            panel.close()
+            panel.deleteLater()
+        self.panels.clear()
+
+class NameSearchIndex:
+    # Case-insensitive search over a changing set of names: a trigram index for substring queries and a
+    # sorted array for prefix queries. The trigram index is updated on every add/remove; the sorted
+    # array is rebuilt on the next prefix query after a change. version counts changes.
+    def __init__(self):
+        self.lowerNames = dict() # lower case name -> original names
+        self.trigrams = dict() # trigram -> lower case names containing it
+        self.sortedNames = None
+        self.version = 0
+
+    def trigramsOf(self, lowerName):
+        return set([lowerName[i:i + 3] for i in range(len(lowerName) - 2)])
+
+    def add(self, name):
+        lowerName = name.lower()
+        names = self.lowerNames.get(lowerName)
+        if names is None:
+            names = self.lowerNames[lowerName] = set()
+            for trigram in self.trigramsOf(lowerName):
+                self.trigrams.setdefault(trigram, set()).add(lowerName)
+            self.sortedNames = None
+        names.add(name)
+        self.version += 1
+
+    def remove(self, name):
+        lowerName = name.lower()
+        names = self.lowerNames.get(lowerName)
+        if names is None:
+            return
+        names.discard(name)
+        if len(names) == 0:
+            del self.lowerNames[lowerName]
+            for trigram in self.trigramsOf(lowerName):
+                entries = self.trigrams[trigram]
+                entries.discard(lowerName)
+                if len(entries) == 0:
+                    del self.trigrams[trigram]
+            self.sortedNames = None
+        self.version += 1
+
+    def clear(self):
+        self.lowerNames.clear()
+        self.trigrams.clear()
+        self.sortedNames = None
+        self.version += 1
+
+    def findPrefix(self, text):
+        if self.sortedNames is None:
+            self.sortedNames = sorted(self.lowerNames.keys())
+        text = text.lower()
+        matches = []
+        for i in range(bisect.bisect_left(self.sortedNames, text), len(self.sortedNames)):
+            if not self.sortedNames[i].startswith(text):
+                break
+            matches.append(self.sortedNames[i])
+        return self.originalNames(matches)
+
+    def findSubstring(self, text):
+        text = text.lower()
+        if len(text) < 3:
+            candidates = self.lowerNames.keys()
+        else:
+            sets = []
+            for trigram in self.trigramsOf(text):
+                if trigram not in self.trigrams:
+                    return set()
+                sets.append(self.trigrams[trigram])
+            sets.sort(key=len)
+            candidates = sets[0].intersection(*sets[1:])
+        return self.originalNames([n for n in candidates if text in n])
+
+    def originalNames(self, lowerNames):
+        output = set()
+        for lowerName in lowerNames:
+            output.update(self.lowerNames[lowerName])
+        return output
+
+class ItemFilterModel(QtCore.QSortFilterProxyModel):
+    # Filtering view of an ItemListModel, the item list itself is never copied. Names are matched by
+    # prefix or substring (case-insensitive) through the model's NameSearchIndex; an optional parameter
+    # filter accepts items whose parameter passes a predicate on its value.
+    PREFIX = "prefix"
+    SUBSTRING = "substring"
+
+    def __init__(self, sourceModel, mode=SUBSTRING, parent=None):
+        QtCore.QSortFilterProxyModel.__init__(self, parent)
+        self.setSourceModel(sourceModel)
+        self.mode = mode
+        self.filterText = ""
+        self.matches = None # names matching filterText, None if the name filter is off
+        self.matchesVersion = None
+        self.parameterFilter = None
+
+    def setFilterText(self, text, mode=None):
+        if mode is not None:
+            self.mode = mode
+        self.filterText = text
+        self.matchesVersion = None
+        self.invalidateFilter()
+
+    def setParameterFilter(self, parameterName=None, predicate=None):
+        # e.g. setParameterFilter("depth", lambda v: v > 2); no arguments removes the filter.
+        # Items of a lazily loaded file are checked against the stored values without loading them.
+        self.parameterFilter = None if parameterName is None else (parameterName, predicate)
+        self.invalidateFilter()
+
+    def getMatches(self):
+        searchIndex = self.sourceModel().searchIndex
+        if self.matchesVersion != searchIndex.version:
+            if len(self.filterText) == 0:
+                self.matches = None
+            elif self.mode == ItemFilterModel.PREFIX:
+                self.matches = searchIndex.findPrefix(self.filterText)
+            else:
+                self.matches = searchIndex.findSubstring(self.filterText)
+            self.matchesVersion = searchIndex.version
+        return self.matches
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        item = self.sourceModel().listdata[sourceRow]
+        if item is None:
+            return True
+        matches = self.getMatches()
+        if matches is not None and item.name.value not in matches:
+            return False
+        if self.parameterFilter is not None:
+            name, predicate = self.parameterFilter
+            if isinstance(item, LazyItem):
+                p = item.peekParameter(name)
+            else:
+                p = item.getParameter(name)
+            if p is None or (predicate is not None and not predicate(p.getValue())):
+                return False
+        return True
+
+    def isChecked(self, row):
+        return self.sourceModel().isChecked(self.mapToSource(self.index(row, 0)).row())
+
 class ItemListModel(QtCore.QAbstractListModel):
     def __init__(self, itemlist, parent=None, *args):
 
         QtCore.QAbstractListModel.__init__(self, parent, *args)
         self.listdata = itemlist
+        # name index: name -> items with that name, kept current through an observer on each item's name.
+        # indexedItems holds [item, name parameter, indexed name, number of rows, last known row] per id(item);
+        # an item can be in two rows for a moment during drag and drop.
+        self.nameIndex = dict()
+        self.indexedItems = dict()
+        self.nameParameters = dict() # id(name parameter) -> same entry as in indexedItems
+        self.nameCounters = dict() # base name -> next counter to try in uniqueName
+        self.searchIndex = NameSearchIndex() # for ItemFilterModel, holds the keys of nameIndex
+        for item in self.listdata:
+            self.indexItem(item)
+
+    def indexItem(self, item):
+        if item is None:
+            return
+        entry = self.indexedItems.get(id(item))
+        if entry is not None:
+            entry[3] += 1
+            return
+        name = item.name.value
+        entry = [item, item.name, name, 1, -1]
+        self.indexedItems[id(item)] = entry
+        self.nameParameters[id(item.name)] = entry
+        self.addToNameIndex(item, name)
+        item.name.addObserver(self.nameChanged)
+
+    def unindexItem(self, item):
+        if item is None:
+            return
+        entry = self.indexedItems.get(id(item))
+        if entry is None:
+            return
+        entry[3] -= 1
+        if entry[3] > 0:
+            return
+        del self.indexedItems[id(item)]
+        del self.nameParameters[id(entry[1])]
+        entry[1].removeObserver(self.nameChanged)
+        self.removeFromNameIndex(item, entry[2])
+
+    def addToNameIndex(self, item, name):
+        items = self.nameIndex.get(name)
+        if items is None:
+            self.nameIndex[name] = [item]
+            self.searchIndex.add(name)
+        else:
+            items.append(item)
+
+    def removeFromNameIndex(self, item, name):
+        items = self.nameIndex.get(name)
+        if items is not None:
+            items.remove(item)
+            if len(items) == 0:
+                del self.nameIndex[name]
+                self.searchIndex.remove(name)
+
+    def nameChanged(self, nameParameter):
+        entry = self.nameParameters.get(id(nameParameter))
+        if entry is None:
+            return
+        name = nameParameter.value
+        if name != entry[2]:
+            self.removeFromNameIndex(entry[0], entry[2])
+            entry[2] = name
+            self.addToNameIndex(entry[0], name)
+            row = self.findRow(entry)
+            if row >= 0: # refresh the row in views and filters
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+    def findRow(self, entry):
+        # row of an indexed item; the last known row is checked first, so renaming an item only
+        # scans the list the first time after rows moved
+        row = entry[4]
+        if not (0 <= row < len(self.listdata) and self.listdata[row] is entry[0]):
+            row = next((r for r, item in enumerate(self.listdata) if item is entry[0]), -1)
+            entry[4] = row
+        return row
+
+    def findItem(self, name):
+        items = self.nameIndex.get(name)
+        if items:
+            return items[0]
+        return None
+
+    def hasName(self, name):
+        return name in self.nameIndex
+
+    def uniqueName(self, name, taken=()):
+        # name itself if unused, otherwise the first free "name - n"; names in taken count as used too
+        if name not in self.nameIndex and name not in taken:
+            return name
+        counter = self.nameCounters.get(name, 1)
+        while "%s - %i" % (name, counter) in self.nameIndex or "%s - %i" % (name, counter) in taken:
+            counter += 1
+        self.nameCounters[name] = counter + 1
+        return "%s - %i" % (name, counter)
+
+    def replaceItem(self, row, item):
+        # put another object in a row, e.g. the loaded item for a LazyItem
+        self.unindexItem(self.listdata[row])
+        self.listdata[row] = item
+        self.indexItem(item)
+        if item is not None:
+            self.indexedItems[id(item)][4] = row
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
 
     def rowCount(self, parent=QtCore.QModelIndex()):
         return len(self.listdata)
@@ -615,12 +1327,12 @@ class ItemListModel(QtCore.QAbstractListModel):
     def setData(self, index, value, role):
         if index.isValid():
             if role == QtCore.Qt.DisplayRole:
-                eindex=-1
-                for i in range(0,  len(self.listdata)):
-                    if self.listdata[i] is not None and self.listdata[i].name.value==str(value):
-                        eindex=i
-                if eindex>=0:
-                    self.listdata[index.row()] = self.listdata[eindex]
+                # drag and drop: the row inserted at the drop position gets the moved item
+                item = self.findItem(str(value))
+                if item is not None:
+                    self.unindexItem(self.listdata[index.row()])
+                    self.listdata[index.row()] = item
+                    self.indexItem(item)
             if role == QtCore.Qt.CheckStateRole:
                 if index.row()<len(self.listdata):
                     self.listdata[index.row()].selected=(not self.listdata[index.row()].selected)
@@ -630,20 +1342,63 @@ class ItemListModel(QtCore.QAbstractListModel):
 
     def addItem(self,  newItem):
         self.beginInsertRows(QtCore.QModelIndex(),  self.rowCount(),
-                             self.rowCount()+1)
+                             self.rowCount())
         self.listdata.append(newItem)
+        self.indexItem(newItem)
         self.endInsertRows()
         return self.index(self.rowCount()-1)
 
+    def addItems(self, newItems):
+        # append many items with a single insert notification
+        newItems = list(newItems)
+        if len(newItems) == 0:
+            return
+        # check all items first, so a wrong one leaves the model and the name index unchanged
+        for item in newItems:
+            if item is not None and not isinstance(getattr(item, "name", None), EditableParameter):
+                raise ValueError("ItemListModel holds items with a name parameter, got %s" % type(item).__name__)
+        first = self.rowCount()
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(newItems) - 1)
+        self.listdata.extend(newItems)
+        for item in newItems:
+            self.indexItem(item)
+        self.endInsertRows()
 
-    def removeRows(self,  row,  count,  parent):
-        self.beginRemoveRows(QtCore.QModelIndex(),  self.rowCount(),  self.rowCount()+1)
-        for i in reversed(range(row,  row+count)):
-            if i<len(self.listdata):
-                del self.listdata[i]
+    def removeRows(self,  row,  count,  parent=QtCore.QModelIndex()):
+        last = min(row + count, len(self.listdata)) - 1
+        if row < 0 or last < row:
+            return False
+        self.beginRemoveRows(QtCore.QModelIndex(),  row,  last)
+        for i in range(row, last + 1):
+            self.unindexItem(self.listdata[i])
+        del self.listdata[row:last + 1]
         self.endRemoveRows()
         return True
 
+    def removeItems(self, rows):
+        # remove any set of rows, with one notification per contiguous range
+        rows = sorted(set(rows), reverse=True)
+        ranges = []
+        for row in rows:
+            if len(ranges) > 0 and ranges[-1][0] == row + 1:
+                ranges[-1][0] = row
+            else:
+                ranges.append([row, row])
+        for first, last in ranges: # back to front, so earlier rows keep their numbers
+            self.removeRows(first, last - first + 1)
+
+    def clear(self):
+        self.beginResetModel()
+        for entry in self.indexedItems.values():
+            entry[1].removeObserver(self.nameChanged)
+        del self.listdata[:]
+        self.nameIndex.clear()
+        self.indexedItems.clear()
+        self.nameParameters.clear()
+        self.nameCounters.clear()
+        self.searchIndex.clear()
+        self.endResetModel()
+
     def insertRows(self, row, count, parent=QtCore.QModelIndex()):
         if parent.isValid(): return False
 
@@ -672,11 +1427,13 @@ class ItemListModel(QtCore.QAbstractListModel):
         return QtCore.Qt.MoveAction
 
 class ListWidget(QSplitter):
-    def __init__(self, parent=None,  title="",  itemlist=[],  itemclass=None,  on_select_cb=None, addItems=True,  removeItems=True, name_generator=None, forceUniqueNames = True,  **creationArgs):
+    def __init__(self, parent=None,  title="",  itemlist=[],  itemclass=None,  on_select_cb=None, addItems=True,  removeItems=True, name_generator=None, forceUniqueNames = True, lazyLoading = False, panelPoolSize = 4, virtualPanelThreshold = 200, searchMode = "substring",  **creationArgs):
         QSplitter.__init__( self, QtCore.Qt.Horizontal, parent=parent)
         self.creationArgs=creationArgs
+        self.lazyLoading = lazyLoading # binary files: load item parameters only when selected or accessed
         self.name_generator = name_generator
         self.forceUniqueNames = forceUniqueNames
+        self.savedRevision = 0
 
         self.on_select_cb=on_select_cb
         ## Create a grid layout to manage the widgets size and position
@@ -693,8 +1450,17 @@ class ListWidget(QSplitter):
 
         self.listmodel=ItemListModel(itemlist)
         self.itemclass=itemclass
+        # open lazily loaded files; an index is closed once no unloaded item of the list reads from it
+        self.fileIndexes = []
+        self.fileIndexCheckPending = False
+        self.listmodel.rowsRemoved.connect(self.scheduleFileIndexCheck)
+        self.listmodel.modelReset.connect(self.scheduleFileIndexCheck)
         self.listw = QtWidgets.QListView()
-        self.listw.setModel(self.listmodel)
+        # the view shows the list through a filter model (search field); view rows map to listmodel rows via mapToSource
+        self.filterModel=ItemFilterModel(self.listmodel, mode=searchMode)
+        self.listw.setModel(self.filterModel)
+        self.listw.setUniformItemSizes(True) # rows are single names, so the view can skip measuring each one
+        self.listw.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.listw.setDragDropMode(self.listw.InternalMove)
         self.listw.setDefaultDropAction(QtCore.Qt.MoveAction)
         self.listw.setDragDropOverwriteMode(False)
@@ -706,6 +1472,8 @@ class ListWidget(QSplitter):
         self.layout.addWidget(QtWidgets.QLabel(title), 0, 0)   # button goes in upper-left
         self.layout.addWidget(self.listw, 1, 0)  # list widget goes in bottom-left
         self.propertyWidget = None
+        # items with more parameters than virtualPanelThreshold only get editors for the visible rows (None: never)
+        self.panelPool = PropertyPanelPool(parent=self, size=panelPoolSize, virtualThreshold=virtualPanelThreshold)
 
         self.listw.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.listw.customContextMenuRequested.connect(self.contextMenuEvent)
@@ -741,7 +1509,9 @@ class ListWidget(QSplitter):
             self.layout.addWidget(buttonwidget, 2, 0)  # button goes in upper-left
 
             self.searchField = QtWidgets.QLineEdit()
+            self.searchField.setPlaceholderText("filter")
             self.searchField.returnPressed.connect(self.searchItem)
+            self.searchField.textChanged.connect(self.filterModel.setFilterText)
             buttonLayout.addWidget(self.searchField)
 
         if len(itemlist)>0:
@@ -750,9 +1520,7 @@ class ListWidget(QSplitter):
             self.selectedTool=None
 
         if self.selectedTool!=None:
-            self.propertyWidget=ToolPropertyWidget(parent=self, tool=self.selectedTool)
-            #self.layout.addWidget(self.propertyWidget, 0, 1,  3,  1)
-            self.rightLayout.addWidget(self.propertyWidget, 0, 0)
+            self.showPropertyPanel(self.selectedTool)
 
         self.setStretchFactor(1, 1)
         self.setSizes([200, 4000])
@@ -768,33 +1536,69 @@ class ListWidget(QSplitter):
         print("searching for", searchText)
         foundItem = self.findItem( name = searchText)
 
+        if foundItem is None and self.filterModel.rowCount() > 0: # no exact match: take the first filtered one
+            foundItem = self.listmodel.listdata[self.filterModel.mapToSource(self.filterModel.index(0, 0)).row()]
+
         if foundItem is not None:
             foundIndex = self.getItems().index(foundItem)
-            qmi = self.listmodel.createIndex(foundIndex, 0)
+            qmi = self.showRow(self.listmodel.index(foundIndex))
             self.listw.selectionModel().setCurrentIndex(qmi, QtCore.QItemSelectionModel.SelectCurrent)
-            self.respondToSelect(foundIndex)
+            self.respondToSelect(qmi)
         else:
             newItem = self.addItem(name = searchText)
 
     def respondToSelect(self,  index):
-        s_index=self.listw.currentIndex()
-        self.selectedTool=self.listmodel.listdata[s_index.row()]
+        s_index=self.filterModel.mapToSource(self.listw.currentIndex())
+        if not s_index.isValid():
+            return
+        self.selectedTool=self.getLoadedItem(s_index.row())
         print("selected ",s_index.row())
         if self.selectedTool!=None:
-            if self.propertyWidget is not None:
-                self.layout.removeWidget(self.propertyWidget)
-                self.propertyWidget.close()
-                gc.collect()
-
-            self.propertyWidget=ToolPropertyWidget(parent=self, tool=self.selectedTool)
-            self.rightLayout.addWidget(self.propertyWidget, 0, 0)
+            self.showPropertyPanel(self.selectedTool)
             if self.on_select_cb!=None:
                 self.on_select_cb(self.selectedTool)
 
+    def showRow(self, sourceIndex):
+        # view index of a listmodel row; filters hiding the row are cleared first
+        viewIndex = self.filterModel.mapFromSource(sourceIndex)
+        if not viewIndex.isValid() and len(self.filterModel.filterText) > 0:
+            if hasattr(self, "searchField"):
+                self.searchField.setText("") # also clears the filter model text
+            else:
+                self.filterModel.setFilterText("")
+            viewIndex = self.filterModel.mapFromSource(sourceIndex)
+        if not viewIndex.isValid() and self.filterModel.parameterFilter is not None:
+            self.filterModel.setParameterFilter()
+            viewIndex = self.filterModel.mapFromSource(sourceIndex)
+        return viewIndex
+
+    def getLoadedItem(self, row):
+        # item of a listmodel row; a LazyItem is loaded and replaced by the real item in the model
+        item = self.listmodel.listdata[row]
+        if isinstance(item, LazyItem):
+            item = item.materialize()
+            if item is not None:
+                self.listmodel.replaceItem(row, item)
+        return item
+
+    def showPropertyPanel(self, tool):
+        panel = self.panelPool.getPanel(tool)
+        if panel is not self.propertyWidget:
+            self.hidePropertyPanel()
+            self.propertyWidget = panel
+            self.rightLayout.addWidget(panel, 0, 0)
+        panel.show()
+
+    def hidePropertyPanel(self):
+        if self.propertyWidget is not None:
+            self.rightLayout.removeWidget(self.propertyWidget)
+            self.panelPool.release(self.propertyWidget)
+            self.propertyWidget = None
+
     def getCheckedItems(self):
         checkedItems = []
-        for index in range(self.listw.model().rowCount()):
-            if self.listw.model().isChecked(index):
+        for index in range(self.listmodel.rowCount()):
+            if self.listmodel.isChecked(index):
                 checkedItems.append(self.listmodel.listdata[index])
         return checkedItems
 
@@ -806,7 +1610,7 @@ class ListWidget(QSplitter):
     def contextMenuEvent(self, pos):
         if self.listw.selectionModel().selection().indexes():
             for i in self.listw.selectionModel().selection().indexes():
-                row, column = i.row(), i.column()
+                row, column = self.filterModel.mapToSource(i).row(), i.column()
             menu = QtWidgets.QMenu()
             filterAction = menu.addAction("duplicate")
             clearAction = menu.addAction("delete")
@@ -814,21 +1618,18 @@ class ListWidget(QSplitter):
             action = menu.exec_(self.mapToGlobal(pos))
 
             if action == filterAction:
-                selectedTool = self.listmodel.listdata[row]
+                selectedTool = self.getLoadedItem(row)
                 print("duplicate", row, selectedTool)
+                if selectedTool is None:
+                    return
                 args = {i: self.creationArgs[i] for i in self.creationArgs if i != "name"}
                 newItem = type(selectedTool)(name = selectedTool.name.getValue(), **args)
-                counter = 1
-                newName = newItem.name.value
-                while newName in [i.name.value for i in self.listmodel.listdata]:
-                    newName = "%s - %i" % (newItem.name.value, counter)
-                    counter += 1
-                newItem.name.updateValue(newName)
-                newItem.restoreParametersFromDict(selectedTool.toDict()["parameters"])
+                newItem.name.updateValue(self.listmodel.uniqueName(newItem.name.value))
+                newItem.copyParametersFrom(selectedTool)
                 self.listmodel.addItem(newItem)
 
             if action == clearAction:
-                print("delete")
+                self.removeItem()
 
 
     def addItem(self,  dummy=None, addExistingItems=True,  **creationArgs):
@@ -852,25 +1653,19 @@ class ListWidget(QSplitter):
         try:
             newItem=itemToCreate(name_generator = self.name_generator, **creationArgs)
             newName=newItem.name.value
-            nameExists=False
-            foundItem=None
-            for item in self.listmodel.listdata:
-                if item is not None and item.name.value==newName:
-                    nameExists=True
-                    foundItem=item
-                    self.respondToSelect(foundItem)
-                    print ("found" , newName, addExistingItems)
-                    break
+            foundItem=self.listmodel.findItem(newName)
+            nameExists=foundItem is not None
+            if nameExists:
+                self.respondToSelect(foundItem)
+                print ("found" , newName, addExistingItems)
 
             if not nameExists or (nameExists and addExistingItems):
-                counter=1
-                while self.forceUniqueNames and (newName in [i.name.value for i in self.listmodel.listdata]):
-                    newName="%s - %i"%(newItem.name.value,  counter)
-                    counter+=1
+                if self.forceUniqueNames:
+                    newName=self.listmodel.uniqueName(newName)
                 newItem.name.updateValue(newName)
                 # add to list model
                 addedItem=self.listmodel.addItem(newItem)
-                self.listw.setCurrentIndex(addedItem)
+                self.listw.setCurrentIndex(self.showRow(addedItem))
                 self.respondToSelect(addedItem)
                 print (newName)
                 return newItem
@@ -882,63 +1677,195 @@ class ListWidget(QSplitter):
         return None
 
     def findItem(self,  name):
-        for item in self.listmodel.listdata:
-            if name==item.name.value:
-                return item
-        return None
+        return self.listmodel.findItem(name)
 
     def removeItem(self):
-        if self.propertyWidget is not None:
-            self.layout.removeWidget(self.propertyWidget)
-            self.propertyWidget.close()
+        self.hidePropertyPanel()
 
         itemindex=self.listw.selectedIndexes()
         if len(itemindex)==0:
             return
-        self.listmodel.removeRows(itemindex[0].row(),  1,  itemindex[0])
+        self.listmodel.removeItems([self.filterModel.mapToSource(i).row() for i in itemindex])
 
 
     def saveTasks(self):
-        filename, pattern = QtWidgets.QFileDialog.getSaveFileName(self, 'Save file', '', "*.json")
+        filename, pattern = QtWidgets.QFileDialog.getSaveFileName(self, 'Save file', '', "*.json;;*.gfwb")
         if len(filename)==0:
             return
 
         print("saving File:", filename)
 
         items = self.getItems()
-        exportedItems = [i.toDict() for i in items]
-        print(exportedItems)
-        jdata = json.dumps(exportedItems)
-        with open(filename, "w") as file:
-            file.write(jdata)
+        if filename.endswith(".gfwb"):
+            newIndex = saveItemsBinary(items, filename)
+            if newIndex is not None: # unloaded items now read from the file just written
+                self.fileIndexes.append(newIndex)
+            self.closeUnusedFileIndexes()
+        else:
+            exportedItems = [i.toDict() for i in items]
+            jdata = json.dumps(exportedItems)
+            with open(filename, "w") as file:
+                file.write(jdata)
+        self.checkpoint()
+
+    def checkpoint(self):
+        # mark all items as saved; returns the revision for exportItemsDelta
+        for i in self.getItems():
+            if i is not None:
+                i.checkpoint()
+        self.savedRevision = nextRevision()
+        return self.savedRevision
+
+    def isModified(self):
+        return any([i.isDirty() for i in self.getItems() if i is not None])
 
     def loadTasks(self):
-        filename, pattern = QtWidgets.QFileDialog.getOpenFileName(self, 'Open file', '', "*.json")
+        filename, pattern = QtWidgets.QFileDialog.getOpenFileName(self, 'Open file', '', "*.json;;*.gfwb")
         if len(filename)==0:
             return
 
-        data = None
-        with open(filename) as file:
-            data = file.read()
-        importedData = json.loads(data)
-
         classDict = {}
         for name, c in self.itemclass.items():
             print(name, str(c.__name__), c)
             classDict[str(c.__name__)] = c
         print(classDict)
+        args = {i:self.creationArgs[i] for i in self.creationArgs if i!="name"}
 
+        if filename.endswith(".gfwb") and self.lazyLoading:
+            fileIndex = ItemFileIndex(filename, classDict, **args)
+            self.fileIndexes.append(fileIndex)
+            self.addLoadedItems(fileIndex.getLazyItems())
+            return
+        if filename.endswith(".gfwb"):
+            self.addLoadedItems(loadItemsBinary(filename, classDict, **args))
+            return
+
+        data = None
+        with open(filename) as file:
+            data = file.read()
+        importedData = json.loads(data)
+
+        items = []
         for i in importedData:
-            args = {i:self.creationArgs[i] for i in self.creationArgs if i!="name"}
             item = buildItemFromDict(i, classDict) (name = i["name"], **args)
             item.restoreParametersFromDict(i["parameters"])
-            print(item)
-
-            
-            originalName = item.name.value
-            counter = 1
-            while self.forceUniqueNames and self.findItem(item.name.value) is not None: 
-                item.name.value = "%s - %i"%(originalName,  counter)
-                counter+=1
+            items.append(item)
+        self.addLoadedItems(items)
+
+    def scheduleFileIndexCheck(self, *args):
+        # rows can be removed in many ranges at once, so check once after they are all gone
+        if len(self.fileIndexes) > 0 and not self.fileIndexCheckPending:
+            self.fileIndexCheckPending = True
+            QtCore.QTimer.singleShot(0, self.closeUnusedFileIndexes)
+
+    def closeUnusedFileIndexes(self):
+        self.fileIndexCheckPending = False
+        used = set([i.fileIndex for i in self.listmodel.listdata if isinstance(i, LazyItem) and i.item is None])
+        for fileIndex in self.fileIndexes:
+            if fileIndex not in used:
+                fileIndex.close()
+        self.fileIndexes = [f for f in self.fileIndexes if f in used]
+
+    def addLoadedItem(self, item):
+        self.addLoadedItems([item])
+
+    def addLoadedItems(self, items):
+        # add loaded items in one model insert; duplicate names (also within items) get a counter
+        items = list(items)
+        names = set()
+        for item in items:
+            if self.forceUniqueNames and (self.listmodel.hasName(item.name.value) or item.name.value in names):
+                item.name.updateValue(self.listmodel.uniqueName(item.name.value, names), execute_callbacks=False)
                 print("duplicate task name, changing to ", item.name.value)
-            self.listmodel.addItem(item)
+            names.add(item.name.value)
+            item.checkpoint()
+        self.listmodel.addItems(items)
+
+
+
+# widget builds and binds are timed per widget type, property panels (built or rebound) per item class (see instrumentation)
+def timedWidgetBuild(build):
+    def buildParameterWidget(object, parent = None):
+        start = time.perf_counter()
+        w = build(object, parent=parent)
+        instrumentation.record("widgetBuild", w.__class__.__name__, time.perf_counter() - start)
+        return w
+    return buildParameterWidget
+
+def timedWidgetBind(bind):
+    def bindParameterWidget(w, object):
+        start = time.perf_counter()
+        bind(w, object)
+        instrumentation.record("widgetBind", w.__class__.__name__, time.perf_counter() - start)
+    return bindParameterWidget
+
+def timedPropertyWidgetInit(init):
+    def __init__(self, parent, tool):
+        start = time.perf_counter()
+        init(self, parent, tool)
+        instrumentation.record("propertyPanel", tool.__class__.__name__, time.perf_counter() - start)
+    return __init__
+
+def timedPropertyWidgetRebind(rebindPanel):
+    def rebind(self, tool):
+        start = time.perf_counter()
+        rebindPanel(self, tool)
+        instrumentation.record("propertyPanel", tool.__class__.__name__ + " (rebind)", time.perf_counter() - start)
+    return rebind
+
+# parameterWidgetFactory is build + bind, so it is covered by the two targets below
+instrumentation.registerTarget(sys.modules[__name__], "buildParameterWidget", timedWidgetBuild)
+instrumentation.registerTarget(sys.modules[__name__], "bindParameterWidget", timedWidgetBind)
+instrumentation.registerTarget(ToolPropertyWidget, "__init__", timedPropertyWidgetInit)
+instrumentation.registerTarget(VirtualPropertyWidget, "__init__", timedPropertyWidgetInit)
+instrumentation.registerTarget(ToolPropertyWidget, "rebind", timedPropertyWidgetRebind)
+instrumentation.registerTarget(VirtualPropertyWidget, "rebind", timedPropertyWidgetRebind)
+
+
+class InstrumentationPanel(QWidget):
+    # table of the instrumentation statistics, refreshed once per second while shown
+    columns = ["category", "name", "count", "total ms", "mean us", "p50 us", "p95 us", "max us"]
+
+    def __init__(self, parent=None):
+        QWidget.__init__(self, parent=parent)
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.setLayout(self.layout)
+        buttons = QtWidgets.QHBoxLayout()
+        self.enableBox = QtWidgets.QCheckBox(parent=self, text="enabled")
+        self.enableBox.setChecked(instrumentation.isEnabled())
+        self.enableBox.stateChanged.connect(self.setEnabledState)
+        buttons.addWidget(self.enableBox)
+        resetButton = QtWidgets.QPushButton(parent=self, text="Reset")
+        resetButton.clicked.connect(self.reset)
+        buttons.addWidget(resetButton)
+        buttons.addStretch()
+        self.layout.addLayout(buttons)
+        self.table = QtWidgets.QTableWidget(0, len(self.columns), parent=self)
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.layout.addWidget(self.table)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def setEnabledState(self, state):
+        if state:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible() and self.table.rowCount() > 0:
+            return
+        entries = instrumentation.getStats()
+        self.table.setRowCount(len(entries))
+        for row, e in enumerate(entries):
+            values = [e["category"], e["name"], "%i" % e["count"], "%.2f" % (e["total"] * 1e3), "%.1f" % (e["mean"] * 1e6),
+                      "%.1f" % (e["p50"] * 1e6), "%.1f" % (e["p95"] * 1e6), "%.1f" % (e["max"] * 1e6)]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
@@ -0,0 +1,176 @@
+import time
+from guifw.abstractparameters import *
+
+# Opt-in timing of the hot paths: parameter callbacks, view refreshes, widget builds and property panels.
+# enable() swaps timing wrappers into the registered targets and disable() puts the originals back, so
+# nothing is measured (and nothing costs) while instrumentation is off.
+#
+# Statistics are kept per (category, name), for example ("callback", "Tool.depth") or ("widgetBuild", "LabeledNumberField").
+
+HISTOGRAM_BUCKETS = 32 # bucket i counts calls taking less than 2**i microseconds
+
+class Stat:
+    __slots__ = ("count", "total", "max", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = min(HISTOGRAM_BUCKETS - 1, int(seconds * 1e6).bit_length())
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction):
+        # upper bound of the histogram bucket holding the given fraction of calls, in seconds
+        if self.count == 0:
+            return 0.0
+        limit = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= limit:
+                return min(self.max, (2 ** i) * 1e-6)
+        return self.max
+
+    def toDict(self):
+        return {"count": self.count, "total": self.total, "mean": self.total / self.count if self.count else 0.0,
+                "max": self.max, "p50": self.percentile(0.5), "p95": self.percentile(0.95),
+                "histogram": list(self.histogram)}
+
+stats = dict()
+targets = []
+enabled = False
+
+def record(category, name, seconds):
+    key = (category, name)
+    stat = stats.get(key)
+    if stat is None:
+        stat = stats[key] = Stat()
+    stat.add(seconds)
+
+def timeCall(category, name, function, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        record(category, name, time.perf_counter() - start)
+
+class Target:
+    # an attribute of a class or module that is replaced by makeWrapper(original) while enabled
+    def __init__(self, owner, attribute, makeWrapper):
+        self.owner = owner
+        self.attribute = attribute
+        self.makeWrapper = makeWrapper
+        self.original = None
+
+    def install(self):
+        self.original = self.owner.__dict__[self.attribute] if isinstance(self.owner, type) else getattr(self.owner, self.attribute)
+        setattr(self.owner, self.attribute, self.makeWrapper(self.original))
+
+    def uninstall(self):
+        setattr(self.owner, self.attribute, self.original)
+        self.original = None
+
+def registerTarget(owner, attribute, makeWrapper):
+    target = Target(owner, attribute, makeWrapper)
+    targets.append(target)
+    if enabled:
+        target.install()
+    return target
+
+def enable():
+    global enabled
+    if not enabled:
+        enabled = True
+        for target in targets:
+            target.install()
+
+def disable():
+    global enabled
+    if enabled:
+        enabled = False
+        for target in reversed(targets):
+            target.uninstall()
+
+def isEnabled():
+    return enabled
+
+def reset():
+    stats.clear()
+
+def getStats(category=None):
+    # list of dicts with category, name and the Stat fields, slowest (by total time) first
+    output = []
+    for (c, name), stat in stats.items():
+        if category is None or c == category:
+            entry = stat.toDict()
+            entry["category"] = c
+            entry["name"] = name
+            output.append(entry)
+    output.sort(key=lambda e: -e["total"])
+    return output
+
+def report(category=None, limit=20):
+    lines = ["%-12s %-40s %8s %10s %10s %10s" % ("category", "name", "count", "total ms", "mean us", "p95 us")]
+    for e in getStats(category)[:limit]:
+        lines.append("%-12s %-40s %8i %10.2f %10.1f %10.1f" % (e["category"], e["name"][:40], e["count"],
+                     e["total"] * 1e3, e["mean"] * 1e6, e["p95"] * 1e6))
+    return "\n".join(lines)
+
+def parameterName(p):
+    if p.parent is not None:
+        return "%s.%s" % (p.parent.__class__.__name__, p.name)
+    return str(p.name)
+
+def ownerName(function):
+    # widget type for bound methods like LabeledNumberField.updateFromParameter, otherwise the function name
+    owner = getattr(function, "__self__", None)
+    if owner is not None:
+        return owner.__class__.__name__
+    return getattr(function, "__qualname__", function.__class__.__name__)
+
+def timedCallback(p, function):
+    def callback(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            record("callback", parameterName(p), seconds)
+            if p.parent is not None:
+                record("itemClass", p.parent.__class__.__name__, seconds)
+    callback.__wrapped__ = function
+    return callback
+
+def timedViewRefresh(p, function):
+    def viewRefresh(parameter):
+        start = time.perf_counter()
+        try:
+            return function(parameter)
+        finally:
+            seconds = time.perf_counter() - start
+            record("viewRefresh", parameterName(p), seconds)
+            record("widgetRefresh", ownerName(function), seconds)
+    viewRefresh.__wrapped__ = function
+    return viewRefresh
+
+def wrapParameterAttribute(wrap):
+    # Replace a parameter slot (or property) by a property that returns the stored function wrapped
+    # for timing. Stored values are untouched, so disabling restores the plain attribute.
+    def makeWrapper(descriptor):
+        def getter(p):
+            function = descriptor.__get__(p)
+            if function is None or isinstance(function, AsyncCallback):
+                return function
+            return wrap(p, function)
+        return property(getter, descriptor.__set__)
+    return makeWrapper
+
+registerTarget(EditableParameter, "callback", wrapParameterAttribute(timedCallback))
+registerTarget(EditableParameter, "viewRefresh", wrapParameterAttribute(timedViewRefresh))
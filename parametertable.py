@@ -0,0 +1,233 @@
+import numpy as np
+from guifw.abstractparameters import *
+
+# storage of the "value" slot of EditableParameter, used by the column views below
+valueSlot = EditableParameter.value
+
+class Column:
+    __slots__ = ("name", "data", "parameters")
+
+    def __init__(self, name, dtype, capacity):
+        self.name = name
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.parameters = []
+
+class ColumnCell:
+    # stored in the value slot of a bound parameter
+    __slots__ = ("column", "row")
+
+    def __init__(self, column, row):
+        self.column = column
+        self.row = row
+
+def getFloatCell(p):
+    cell = valueSlot.__get__(p)
+    value = cell.column.data[cell.row]
+    if value != value: # NaN stands for None
+        return None
+    return float(value)
+
+def setFloatCell(p, value):
+    cell = valueSlot.__get__(p)
+    cell.column.data[cell.row] = np.nan if value is None else value
+
+def getBoolCell(p):
+    cell = valueSlot.__get__(p)
+    return bool(cell.column.data[cell.row])
+
+def setBoolCell(p, value):
+    cell = valueSlot.__get__(p)
+    cell.column.data[cell.row] = value
+
+columnTypes = {NumericalParameter: (np.float64, getFloatCell, setFloatCell),
+               CheckboxParameter: (np.bool_, getBoolCell, setBoolCell)}
+
+def constrainValues(values, min=None, max=None, step=0, enforceRange=False, enforceStep=False):
+    # Vectorised NumericalParameter.constrainValue. The settings can be scalars or arrays with one
+    # entry per value; None for min/max means unbounded.
+    values = np.array(values, dtype=np.float64)
+    if np.any(enforceRange):
+        low = np.where(np.equal(min, None), -np.inf, min).astype(np.float64)
+        high = np.where(np.equal(max, None), np.inf, max).astype(np.float64)
+        values = np.where(enforceRange, np.minimum(high, np.maximum(low, values)), values)
+    if np.any(enforceStep):
+        step = np.asarray(step, dtype=np.float64)
+        if np.any(np.logical_and(enforceStep, step == 0)): # as in the scalar path
+            raise ZeroDivisionError("enforceStep with step 0")
+        safeStep = np.where(step == 0, 1.0, step) # only reached for entries without enforceStep
+        values = np.where(enforceStep, np.trunc(values / safeStep) * step, values)
+    return values
+
+def getConstraints(parameters):
+    # per-parameter constraint arrays for constrainValues
+    return {"min": np.array([p.min for p in parameters], dtype=object),
+            "max": np.array([p.max for p in parameters], dtype=object),
+            "step": np.array([p.step for p in parameters], dtype=np.float64),
+            "enforceRange": np.array([p.enforceRange for p in parameters], dtype=bool),
+            "enforceStep": np.array([p.enforceStep for p in parameters], dtype=bool)}
+
+def updateNumericalValues(parameters, values, execute_callbacks=True):
+    # Set many NumericalParameters at once, with range/step constraints applied as array operations.
+    # Callbacks and view refreshes are coalesced into one batch. Returns the constrained values.
+    parameters = list(parameters)
+    values = constrainValues(values, **getConstraints(parameters))
+    with ParameterBatch():
+        for p, value in zip(parameters, values.tolist()):
+            p.value = value
+            p.notifyChange(execute_callbacks)
+    return values
+
+viewClasses = dict()
+
+def getColumnType(parameterClass):
+    for c in parameterClass.__mro__:
+        if c in columnTypes:
+            return columnTypes[c]
+    return None
+
+def getViewClass(parameterClass):
+    # Subclass whose value property reads and writes a table cell. It adds no slots, so existing
+    # parameters can switch to it by assigning __class__. It keeps the class name, so widget lookup is unaffected.
+    if parameterClass not in viewClasses:
+        dtype, getter, setter = getColumnType(parameterClass)
+        viewClasses[parameterClass] = type(parameterClass.__name__, (parameterClass,),
+                                           {"__slots__": (), "value": property(getter, setter), "plainClass": parameterClass})
+    return viewClasses[parameterClass]
+
+
+class ParameterTable:
+    # Columnar storage for the numerical and checkbox parameters of many items of one class.
+    # Each such parameter becomes a NumPy column with one row per item. The parameter objects stay
+    # in their items and keep working as before, but read and write their value through their row,
+    # so getColumn()/setColumn()/getStatistics() work on whole columns at once.
+    def __init__(self, items=[], capacity=16):
+        self.itemClass = None
+        self.items = []
+        self.columns = dict()
+        self.capacity = capacity
+        self.addItems(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def getColumnNames(self):
+        return list(self.columns.keys())
+
+    def createColumns(self, item):
+        self.itemClass = type(item)
+        for p in iterRecursiveList(item.parameters):
+            columnType = getColumnType(type(p))
+            if columnType is not None and p.name not in self.columns:
+                self.columns[p.name] = Column(p.name, columnType[0], self.capacity)
+
+    def reserve(self, size):
+        if size <= self.capacity:
+            return
+        self.capacity = max(size, 2 * self.capacity)
+        for column in self.columns.values():
+            data = np.zeros(self.capacity, dtype=column.data.dtype)
+            data[:len(self.items)] = column.data[:len(self.items)]
+            column.data = data
+
+    def addItems(self, items):
+        items = list(items)
+        if len(items) == 0:
+            return
+        # check all items first, so a wrong one leaves the table unchanged
+        itemClass = self.itemClass if self.itemClass is not None else type(items[0])
+        for item in items:
+            if type(item) is not itemClass:
+                raise ValueError("ParameterTable holds %s items, got %s" % (itemClass.__name__, type(item).__name__))
+        if self.itemClass is None:
+            self.createColumns(items[0])
+        self.reserve(len(self.items) + len(items))
+        for item in items:
+            row = len(self.items)
+            self.items.append(item)
+            for name, column in self.columns.items():
+                self.bindParameter(item.getParameter(name), column, row)
+
+    def addItem(self, item):
+        self.addItems([item])
+
+    def bindParameter(self, p, column, row):
+        value = p.value
+        p.__class__ = getViewClass(type(p))
+        valueSlot.__set__(p, ColumnCell(column, row))
+        p.value = value
+        column.parameters.append(p)
+
+    def unbindParameter(self, p):
+        value = p.value
+        p.__class__ = p.plainClass
+        p.value = value
+
+    def removeItems(self, items):
+        # remove items from the table; their parameters hold plain values again
+        removed = set([id(i) for i in items])
+        keep = [row for row, item in enumerate(self.items) if id(item) not in removed]
+        for column in self.columns.values():
+            for row, p in enumerate(column.parameters):
+                if id(self.items[row]) in removed:
+                    self.unbindParameter(p)
+            column.data[:len(keep)] = column.data[keep]
+            column.parameters = [column.parameters[row] for row in keep]
+            for row, p in enumerate(column.parameters):
+                valueSlot.__get__(p).row = row
+        self.items = [self.items[row] for row in keep]
+
+    def removeItem(self, item):
+        self.removeItems([item])
+
+    def detach(self):
+        # give all parameters their plain values back and empty the table
+        for column in self.columns.values():
+            for p in column.parameters:
+                self.unbindParameter(p)
+            column.parameters = []
+        self.items = []
+
+    def getColumn(self, name):
+        # live, read-only view of the values of one parameter across all items; write with setColumn
+        view = self.columns[name].data[:len(self.items)]
+        view.flags.writeable = False
+        return view
+
+    def setColumn(self, name, values, execute_callbacks=True, constrain=True):
+        # assign values for all items at once; callbacks and refreshes are coalesced in one batch.
+        # Numerical columns apply each parameter's range/step constraints unless constrain is False.
+        column = self.columns[name]
+        if constrain and column.data.dtype == np.float64:
+            values = constrainValues(np.broadcast_to(values, len(self.items)), **getConstraints(column.parameters))
+        column.data[:len(self.items)] = values
+        with ParameterBatch():
+            for p in column.parameters:
+                p.notifyChange(execute_callbacks)
+
+    def getRow(self, item):
+        return self.items.index(item)
+
+    def getStatistics(self, name):
+        data = self.getColumn(name).astype(np.float64)
+        if len(data) == 0:
+            return {"count": 0}
+        return {"count": len(data), "min": float(np.nanmin(data)), "max": float(np.nanmax(data)),
+                "mean": float(np.nanmean(data)), "std": float(np.nanstd(data))}
+
+    def toStructuredArray(self):
+        # one record per item: name plus all columns
+        nameLength = max([1] + [len(i.name.getValue()) for i in self.items])
+        dtype = [("name", "U%i" % nameLength)] + [(name, column.data.dtype) for name, column in self.columns.items()]
+        output = np.zeros(len(self.items), dtype=dtype)
+        output["name"] = [i.name.getValue() for i in self.items]
+        for name in self.columns.keys():
+            output[name] = self.getColumn(name)
+        return output
+
+    def exportCSV(self, filename):
+        names = self.getColumnNames()
+        with open(filename, "w") as file:
+            file.write(",".join(["name"] + names) + "\n")
+            columns = [self.getColumn(name) for name in names]
+            for row, item in enumerate(self.items):
+                file.write(",".join([item.name.getValue()] + [str(c[row]) for c in columns]) + "\n")